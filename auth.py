@@ -1,4 +1,8 @@
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 
@@ -12,14 +16,69 @@ class JwtSettings:
     secret_key: str
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 15
+    # Verified-token LRU size; 0 disables it.
+    cache_max_entries: int = 4096
+
+
+@dataclass(frozen=True)
+class Principal:
+    username: str
+    user_id: int
+    expires_at: int
+
+
+_jwt_settings: JwtSettings | None = None
+
+# Verified tokens keyed by their sha256 digest -> (payload, exp).
+_verified_tokens: "OrderedDict[bytes, tuple[dict, int]]" = OrderedDict()
+_verified_lock = threading.Lock()
 
 
 def get_jwt_settings() -> JwtSettings:
+    """Settings are read from the environment once, on first use (after load_dotenv)."""
+    global _jwt_settings
+    if _jwt_settings is not None:
+        return _jwt_settings
     secret_key = os.getenv("JWT_SECRET_KEY")
     if not secret_key:
         raise RuntimeError("JWT_SECRET_KEY is not set")
     expire_minutes = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
-    return JwtSettings(secret_key=secret_key, access_token_expire_minutes=expire_minutes)
+    _jwt_settings = JwtSettings(
+        secret_key=secret_key,
+        access_token_expire_minutes=expire_minutes,
+        cache_max_entries=int(os.getenv("JWT_CACHE_MAX_ENTRIES", "4096")),
+    )
+    return _jwt_settings
+
+
+def _decode_token(token: str) -> dict:
+    """Verify a token, reusing an earlier verification until the token expires.
+
+    Raises JWTError for invalid or expired tokens.
+    """
+    settings = get_jwt_settings()
+    max_entries = settings.cache_max_entries
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    now = time.time()
+    if max_entries > 0:
+        with _verified_lock:
+            cached = _verified_tokens.get(key)
+            if cached is not None:
+                payload, exp = cached
+                if exp > now:
+                    _verified_tokens.move_to_end(key)
+                    return payload
+                del _verified_tokens[key]
+
+    payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    exp = payload.get("exp")
+    if max_entries > 0 and isinstance(exp, (int, float)):
+        with _verified_lock:
+            _verified_tokens[key] = (payload, int(exp))
+            _verified_tokens.move_to_end(key)
+            while len(_verified_tokens) > max_entries:
+                _verified_tokens.popitem(last=False)
+    return payload
 
 
 def create_access_token(subject: str, user_id: int) -> str:
@@ -40,11 +99,8 @@ security = HTTPBearer()
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Verify JWT token and return the payload"""
-    settings = get_jwt_settings()
-    token = credentials.credentials
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
+        return _decode_token(credentials.credentials)
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -53,24 +109,27 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security))
         )
 
 
-def get_current_user(token_payload: dict = Depends(verify_token)) -> str:
-    """Extract username from verified token"""
-    username: str = token_payload.get("sub")
-    if not username:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token payload",
-        )
-    return username
-
+def get_principal(token_payload: dict = Depends(verify_token)) -> Principal:
+    """The authenticated user for this request.
 
-def get_current_user_id(token_payload: dict = Depends(verify_token)) -> int:
-    """Extract user_id from verified token"""
+    FastAPI resolves this once per request, so endpoints that need both the
+    username and the user id still verify the token only once.
+    """
+    username: str | None = token_payload.get("sub")
     user_id: int | None = token_payload.get("uid")
-    if user_id is None:
+    if not username or user_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token payload",
         )
-    return user_id
+    return Principal(username=username, user_id=user_id, expires_at=token_payload.get("exp", 0))
 
+
+def get_current_user(principal: Principal = Depends(get_principal)) -> str:
+    """Extract username from verified token"""
+    return principal.username
+
+
+def get_current_user_id(principal: Principal = Depends(get_principal)) -> int:
+    """Extract user_id from verified token"""
+    return principal.user_id
@@ -0,0 +1,90 @@
+"""Concurrent login/register throughput: bcrypt on the event loop vs. the hashing pool.
+
+Simulates a burst of logins (verify) or registrations (hash) and reports
+throughput per core plus how long the event loop was stalled, measured by a
+ticker task that should wake every 10 ms. No database or server is needed.
+
+Run from the project root:
+
+    python benchmarks/bench_login.py [--logins 64] [--rounds 12] [--mode verify|hash]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+TICK_SECONDS = 0.01
+
+
+async def _ticker(lags: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - started - TICK_SECONDS)
+
+
+async def _run(name: str, make_call, count: int) -> None:
+    lags: list[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await asyncio.gather(*(make_call() for _ in range(count)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+
+    cores = os.cpu_count() or 1
+    per_second = count / elapsed
+    max_lag = max(lags, default=elapsed) * 1000
+    p50_lag = (statistics.median(lags) if lags else elapsed) * 1000
+    print(
+        f"{name:<10} {count} calls in {elapsed:6.2f}s  "
+        f"{per_second:7.1f}/s  {per_second / cores:6.1f}/s/core  "
+        f"loop lag p50 {p50_lag:7.1f} ms  max {max_lag:7.1f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--mode", choices=["verify", "hash"], default="verify")
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    from models.users import hash_password, verify_and_update_password
+    from services.passwords import hash_password_async, shutdown_executor, verify_password_async
+
+    password = "korrekt-hest-batteri-stift"
+    stored = hash_password(password)
+
+    if args.mode == "verify":
+        async def blocking():
+            verify_and_update_password(password, stored)
+
+        async def pooled():
+            await verify_password_async(password, stored)
+    else:
+        async def blocking():
+            hash_password(password)
+
+        async def pooled():
+            await hash_password_async(password)
+
+    print(f"bcrypt rounds={args.rounds} mode={args.mode} cores={os.cpu_count()}")
+    await _run("on-loop", blocking, args.logins)
+    await _run("pooled", pooled, args.logins)
+    shutdown_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""Throughput and chunk-shape comparison: split_text vs. the token-aware splitter.
+
+Run from the project root:
+
+    python benchmarks/bench_splitter.py [path.pdf|path.txt] [--repeat 5]
+"""
+import argparse
+import statistics
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+from pypdf import PdfReader
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from services.openai_client import get_embedding_model  # noqa: E402
+from services.rag_pipeline import split_text  # noqa: E402
+from services.text_splitter import iter_chunks  # noqa: E402
+from services.tokenizer import count_tokens  # noqa: E402
+
+DEFAULT_DOC = PROJECT_ROOT / "database_data" / "samtalemetodikk_foreldre_rag.pdf"
+
+
+def _load(path: Path) -> str:
+    if path.suffix.lower() == ".pdf":
+        reader = PdfReader(BytesIO(path.read_bytes()))
+        return "\n".join((page.extract_text() or "") for page in reader.pages)
+    return path.read_text(encoding="utf-8")
+
+
+def _measure(name: str, split, text: str, repeat: int) -> None:
+    timings = []
+    chunks: list[str] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = list(split(text))
+        timings.append(time.perf_counter() - started)
+
+    model = get_embedding_model()
+    tokens = [count_tokens(c, model) for c in chunks]
+    sentence_ends = sum(1 for c in chunks if c.rstrip().endswith((".", "!", "?", "…", ":")))
+    best = min(timings)
+    print(
+        f"{name:<14} {len(text) / best / 1e6:>8.2f} MB/s {len(chunks):>7} "
+        f"{statistics.mean(tokens):>9.1f} {max(tokens):>7} {sum(tokens):>10} "
+        f"{sentence_ends / len(chunks) * 100:>8.1f}%"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?", type=Path, default=DEFAULT_DOC)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, default=300)
+    parser.add_argument("--overlap-tokens", type=int, default=50)
+    args = parser.parse_args()
+
+    text = _load(args.path)
+    print(f"{args.path.name}: {len(text)} characters, best of {args.repeat}")
+    print(f"{'splitter':<14} {'throughput':>13} {'chunks':>7} {'avg tok':>9} {'max tok':>7} {'total tok':>10} {'sentence':>9}")
+    _measure("split_text", split_text, text, args.repeat)
+    _measure(
+        "iter_chunks",
+        lambda t: iter_chunks(t, max_tokens=args.max_tokens, overlap_tokens=args.overlap_tokens),
+        text,
+        args.repeat,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import asyncio
+import logging
 import os
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy import text
@@ -5,11 +7,15 @@ from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.exc import SQLAlchemyError
 
 
+logger = logging.getLogger(__name__)
+
+
 class Base(DeclarativeBase):
     pass
 
 
 _engine = None
+_background_tasks: set[asyncio.Task] = set()
 _sessionmaker: async_sessionmaker[AsyncSession] | None = None
 
 
@@ -24,6 +30,13 @@ def _init_engine() -> None:
     _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False)
 
 
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """Session factory for work that outlives a request-scoped session."""
+    if _sessionmaker is None:
+        _init_engine()
+    return _sessionmaker
+
+
 async def get_session():
     if _sessionmaker is None:
         _init_engine()
@@ -96,7 +109,80 @@ async def init_db() -> None:
                     "ADD COLUMN IF NOT EXISTS emoji VARCHAR(10)"
                 )
             )
+        async with _engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "ALTER TABLE rag_chunks "
+                    "ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)"
+                )
+            )
+        async with _engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "ALTER TABLE feedback_records "
+                    "ADD COLUMN IF NOT EXISTS eval_key VARCHAR(64)"
+                )
+            )
+        async with _engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "ALTER TABLE rag_chunks "
+                    "ADD COLUMN IF NOT EXISTS chunk_tsv tsvector "
+                    "GENERATED ALWAYS AS (to_tsvector('norwegian', chunk_text)) STORED"
+                )
+            )
+            await conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_rag_chunks_chunk_tsv "
+                    "ON rag_chunks USING gin (chunk_tsv)"
+                )
+            )
+        async with _engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_chat_sessions_user_id_created_at "
+                    "ON chat_sessions (user_id, created_at DESC, id DESC) "
+                    "INCLUDE (scenario_id, title)"
+                )
+            )
+            await conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_chat_messages_session_id_id "
+                    "ON chat_messages (session_id, id)"
+                )
+            )
+            await conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_users_username_pattern "
+                    "ON users (username varchar_pattern_ops)"
+                )
+            )
+            await conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_users_email_pattern "
+                    "ON users (email varchar_pattern_ops)"
+                )
+            )
     except SQLAlchemyError:
         # Non-fatal: the column may already exist, or the DB role may lack ALTER
         # TABLE privileges.  The app can continue normally in either case.
         pass
+    # Best-effort ANN index for rag_chunks.embedding; without it similarity
+    # search falls back to an exact sequential scan. A missing index is built
+    # concurrently in the background so startup does not wait for it;
+    # m/ef_construction changes are applied with database_data/rag_index.py create.
+    task = asyncio.create_task(_build_vector_index())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _build_vector_index() -> None:
+    from services.rag_store import create_vector_index_if_missing
+
+    try:
+        async with _engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if await create_vector_index_if_missing(conn):
+                logger.info("Built the rag_chunks vector index.")
+    except SQLAlchemyError:
+        logger.warning("Could not create the rag_chunks vector index.", exc_info=True)
@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from models.rag import TS_CONFIG, RagChunk  # noqa: E402
+from services.openai_client import embed_texts  # noqa: E402
+from services.rag_store import count_lexical_matches, ensure_vector_index, search_similar  # noqa: E402
+
+
+async def _exact_ids(session, query_embedding, k: int) -> list[int]:
+    # Force a sequential scan so the baseline is the true nearest neighbours.
+    await session.execute(text("SELECT set_config('enable_indexscan', 'off', true)"))
+    rows = await search_similar(session=session, query_embedding=query_embedding, k=k)
+    await session.rollback()
+    return [r.id for r in rows]
+
+
+async def _ann_ids(session, query_embedding, k: int, ef_search: int) -> tuple[list[int], float]:
+    started = time.perf_counter()
+    rows = await search_similar(
+        session=session, query_embedding=query_embedding, k=k, ef_search=ef_search
+    )
+    elapsed = time.perf_counter() - started
+    await session.rollback()
+    return [r.id for r in rows], elapsed
+
+
+def _perturb(vector: list[float], noise: float, rng: random.Random) -> list[float]:
+    # Gaussian noise with an expected norm of ``noise`` relative to the unit
+    # vector, renormalised so the query sits near, not on, a stored chunk.
+    sigma = noise / math.sqrt(len(vector))
+    moved = [x + rng.gauss(0.0, sigma) for x in vector]
+    norm = math.sqrt(sum(x * x for x in moved)) or 1.0
+    return [x / norm for x in moved]
+
+
+async def _query_embeddings(
+    session, queries: int, noise: float, questions: Path | None
+) -> list[list[float]]:
+    if questions is not None:
+        lines = [line.strip() for line in questions.read_text(encoding="utf-8").splitlines()]
+        return await embed_texts([line for line in lines if line][:queries])
+    # Stored embeddings as-is would always find themselves at distance 0,
+    # which the HNSW graph does trivially and inflates recall.
+    sample = await session.execute(
+        select(RagChunk.embedding).order_by(func.random()).limit(queries)
+    )
+    rng = random.Random(0)
+    return [_perturb(list(e), noise, rng) for (e,) in sample.all()]
+
+
+async def recall_report(
+    session_factory,
+    queries: int,
+    k: int,
+    ef_values: list[int],
+    noise: float = 0.5,
+    questions: Path | None = None,
+) -> None:
+    async with session_factory() as session:
+        total = await session.scalar(select(func.count(RagChunk.id)))
+        query_embeddings = await _query_embeddings(session, queries, noise, questions)
+        await session.rollback()
+
+        if not query_embeddings:
+            print("No queries (empty rag_chunks or questions file); nothing to measure.")
+            return
+
+        exact = []
+        exact_time = 0.0
+        for q in query_embeddings:
+            started = time.perf_counter()
+            exact.append(set(await _exact_ids(session, q, k)))
+            exact_time += time.perf_counter() - started
+
+        source = f"questions from {questions}" if questions is not None else f"noise={noise}"
+        print(f"{total} chunks, {len(query_embeddings)} queries ({source}), k={k}")
+        print(f"{'ef_search':>10} {'recall@k':>10} {'avg ms':>10}")
+        print(f"{'exact':>10} {1.0:>10.3f} {exact_time / len(query_embeddings) * 1000:>10.2f}")
+        for ef in ef_values:
+            hits = 0
+            elapsed = 0.0
+            for q, truth in zip(query_embeddings, exact):
+                ids, took = await _ann_ids(session, q, k, ef)
+                hits += len(truth.intersection(ids))
+                elapsed += took
+            recall = hits / sum(len(t) for t in exact)
+            print(f"{ef:>10} {recall:>10.3f} {elapsed / len(query_embeddings) * 1000:>10.2f}")
+
+
+# Several sentences, like the joined user turns feedback evaluation searches with.
+DEFAULT_LEXICAL_QUERY = (
+    "Jeg forstår at du er lei deg. Vil du fortelle meg hva som skjedde på skolen i dag? "
+    "Det er lov å være sint, men vi må finne en løsning sammen."
+)
+
+
+async def lexical_check(session_factory, query: str) -> bool:
+    """Compare lexical matches for the hybrid (OR) query against an AND query."""
+    async with session_factory() as session:
+        any_terms = await count_lexical_matches(session, query)
+        all_terms = await session.scalar(
+            select(func.count(RagChunk.id)).where(
+                RagChunk.chunk_tsv.op("@@")(
+                    func.plainto_tsquery(literal_column(f"'{TS_CONFIG}'::regconfig"), query)
+                )
+            )
+        )
+    print(f"query: {query!r}")
+    print(f"chunks matching all terms: {all_terms}")
+    print(f"chunks matching any term (hybrid search): {any_terms}")
+    return any_terms > 0
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage the HNSW index on rag_chunks.embedding")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    create = sub.add_parser("create", help="Create the index, or rebuild it if m/ef_construction changed")
+    create.add_argument("--m", type=int, default=None)
+    create.add_argument("--ef-construction", type=int, default=None)
+
+    report = sub.add_parser("report", help="Print recall@k and latency per ef_search against exact search")
+    report.add_argument("--queries", type=int, default=50)
+    report.add_argument("--k", type=int, default=5)
+    report.add_argument("--ef", type=int, nargs="+", default=[10, 20, 40, 80, 160, 320])
+    report.add_argument(
+        "--noise", type=float, default=0.5,
+        help="Relative noise added to sampled chunk embeddings to make the queries",
+    )
+    report.add_argument(
+        "--questions", type=Path, default=None,
+        help="File with one question per line to embed as queries instead",
+    )
+
+    lexical = sub.add_parser(
+        "lexical", help="Check that a multi-sentence query still gets lexical hits in hybrid search"
+    )
+    lexical.add_argument("query", nargs="?", default=DEFAULT_LEXICAL_QUERY)
+
+    args = parser.parse_args()
+
+    load_dotenv(PROJECT_ROOT / ".env")
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("DATABASE_URL is not set (expected in environment or .env)")
+
+    engine = create_async_engine(database_url, echo=False, pool_pre_ping=True)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        if args.command == "create":
+            async with engine.begin() as conn:
+                rebuilt = await ensure_vector_index(conn, m=args.m, ef_construction=args.ef_construction)
+            print("HNSW index built." if rebuilt else "HNSW index already up to date.")
+        elif args.command == "lexical":
+            if not await lexical_check(session_factory, args.query):
+                raise SystemExit("No lexical matches: hybrid search would be vector-only.")
+        else:
+            await recall_report(
+                session_factory, args.queries, args.k, args.ef,
+                noise=args.noise, questions=args.questions,
+            )
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,12 +1,10 @@
 import asyncio
 import os
 import sys
-from io import BytesIO
 from pathlib import Path
 
 from dotenv import load_dotenv
-from pypdf import PdfReader
-from sqlalchemy import delete, select, text
+from sqlalchemy import select, text
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
@@ -20,19 +18,18 @@ import models.db  # noqa: E402,F401
 import models.rag  # noqa: E402,F401
 import models.scenario  # noqa: E402,F401
 from models.db import User  # noqa: E402
-from models.rag import RagChunk  # noqa: E402
 from models.scenario import Scenario  # noqa: E402
 from models.users import hash_password  # noqa: E402
+from services.pdf_text import extract_pdf_text  # noqa: E402
 from services.rag_pipeline import ingest_documents  # noqa: E402
 
 
 RAG_DOC_FILENAME = "samtalemetodikk_foreldre_rag.pdf"
 
 
-def _extract_pdf_text(pdf_path: Path) -> str:
+async def _extract_pdf_text(pdf_path: Path) -> str:
     raw = pdf_path.read_bytes()
-    reader = PdfReader(BytesIO(raw))
-    text = "\n".join((page.extract_text() or "") for page in reader.pages).strip()
+    text = await extract_pdf_text(raw)
     if not text:
         raise RuntimeError(f"No extractable text found in PDF: {pdf_path.name}")
     return text
@@ -65,6 +62,12 @@ async def seed_dummy_data() -> None:
                         "ADD COLUMN IF NOT EXISTS emoji VARCHAR(10)"
                     )
                 )
+                await conn.execute(
+                    text(
+                        "ALTER TABLE rag_chunks "
+                        "ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)"
+                    )
+                )
 
                 column_type_result = await conn.execute(
                     text(
@@ -366,12 +369,10 @@ SVAR ALLTID på norsk. Hold deg i rollen hele samtalen, selv om forelderen gjør
             if not pdf_path.exists():
                 raise RuntimeError(f"Missing required RAG PDF: {pdf_path}")
 
-            pdf_text = _extract_pdf_text(pdf_path)
-
-            # Keep seeding idempotent by replacing existing chunks for this doc_id.
-            await session.execute(delete(RagChunk).where(RagChunk.doc_id == RAG_DOC_FILENAME))
-            await session.commit()
+            pdf_text = await _extract_pdf_text(pdf_path)
 
+            # Re-ingestion is incremental: unchanged chunks are kept, so re-seeding
+            # only embeds what changed in the PDF.
             chunks_added = await ingest_documents(
                 session=session,
                 items=[
@@ -386,7 +387,7 @@ SVAR ALLTID på norsk. Hold deg i rollen hele samtalen, selv om forelderen gjør
                     )
                 ],
             )
-            print(f"RAG PDF ingested: {RAG_DOC_FILENAME} ({chunks_added} chunk(s)).")
+            print(f"RAG PDF ingested: {RAG_DOC_FILENAME} ({chunks_added} new chunk(s)).")
     finally:
         await engine.dispose()
 
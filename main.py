@@ -4,7 +4,12 @@ from fastapi import FastAPI
 from dotenv import load_dotenv
 import uvicorn
 from routers import users, chat, rag, scenarios, tts, stt
+from auth import get_jwt_settings
 from database import init_db
+from services import feedback_jobs, ingest_jobs, stt_service, tts_service
+from services.openai_client import close_client
+from services.passwords import shutdown_executor as shutdown_password_executor
+from services.pdf_text import shutdown_executor
 
 load_dotenv()
 
@@ -20,7 +25,21 @@ app.include_router(stt.router)
 
 @app.on_event("startup")
 async def on_startup():
+    get_jwt_settings()
     await init_db()
+    await ingest_jobs.start_workers()
+    await feedback_jobs.start_workers()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await ingest_jobs.stop_workers()
+    await feedback_jobs.stop_workers()
+    await close_client()
+    await stt_service.close_client()
+    await tts_service.close_client()
+    shutdown_executor()
+    shutdown_password_executor()
 
 
 @app.get("/")
@@ -31,6 +31,10 @@ class ChatMessageResponse(BaseModel):
 
 class FinishRequest(BaseModel):
     session_id: str
+    background: bool = Field(
+        default=False,
+        description="Return 202 with a job id and evaluate in the background.",
+    )
 
 
 class CriterionScore(BaseModel):
@@ -56,3 +60,11 @@ class FinishResponse(BaseModel):
 class StoredMessage(BaseModel):
     role: Role
     content: str
+
+
+class FinishJobResponse(BaseModel):
+    job_id: str
+    session_id: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    error: Optional[str] = None
+    result: Optional[FinishResponse] = None
@@ -1,4 +1,4 @@
-from sqlalchemy import String
+from sqlalchemy import Index, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from database import Base
@@ -12,3 +12,9 @@ class User(Base):
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     full_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
     password_hash: Mapped[str] = mapped_column(String(255))
+
+
+# Prefix search (LIKE 'abc%') on GET /users/. The unique indexes above only
+# serve LIKE under the C collation; pattern_ops indexes work with any collation.
+Index("ix_users_username_pattern", User.username, postgresql_ops={"username": "varchar_pattern_ops"})
+Index("ix_users_email_pattern", User.email, postgresql_ops={"email": "varchar_pattern_ops"})
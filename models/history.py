@@ -1,8 +1,8 @@
 from datetime import datetime
 from typing import Any
 
-from sqlalchemy import DateTime, ForeignKey, Integer, JSON, String, Text, func
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, JSON, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from database import Base
 
@@ -18,6 +18,21 @@ class ChatSessionDB(Base):
         DateTime(timezone=True), server_default=func.now()
     )
 
+    # Read-only; feedback records are written through FeedbackRecord directly.
+    feedback: Mapped["FeedbackRecord | None"] = relationship(
+        uselist=False, viewonly=True, lazy="raise"
+    )
+
+
+# Keyset pagination for a user's sessions (GET /chat/sessions), newest first.
+Index(
+    "ix_chat_sessions_user_id_created_at",
+    ChatSessionDB.user_id,
+    ChatSessionDB.created_at.desc(),
+    ChatSessionDB.id.desc(),
+    postgresql_include=["scenario_id", "title"],
+)
+
 
 class ChatMessageDB(Base):
     __tablename__ = "chat_messages"
@@ -33,6 +48,10 @@ class ChatMessageDB(Base):
     )
 
 
+# Paging through a session's messages by id (GET /chat/session/{id}).
+Index("ix_chat_messages_session_id_id", ChatMessageDB.session_id, ChatMessageDB.id)
+
+
 class FeedbackRecord(Base):
     __tablename__ = "feedback_records"
 
@@ -45,6 +64,26 @@ class FeedbackRecord(Base):
     positive_feedback: Mapped[Any] = mapped_column(JSON)
     negative_feedback: Mapped[Any] = mapped_column(JSON)
     sources: Mapped[Any] = mapped_column(JSON)
+    # Hash of what the evaluation depended on; see feedback_pipeline.evaluation_key
+    eval_key: Mapped[str | None] = mapped_column(String(64), nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
+
+
+class FeedbackJob(Base):
+    __tablename__ = "feedback_jobs"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    session_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("chat_sessions.id"), index=True
+    )
+    # queued | running | succeeded | failed
+    status: Mapped[str] = mapped_column(String(20), index=True, default="queued")
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
@@ -1,16 +1,91 @@
-from sqlalchemy import Text, String
-from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+
+from sqlalchemy import Computed, DateTime, ForeignKey, Index, Integer, LargeBinary, Text, String, func
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column
 from pgvector.sqlalchemy import Vector
 
 from database import Base
 
 EMBED_DIM = 1536  
+# Text search configuration for chunk_tsv and hybrid-search queries.
+TS_CONFIG = "norwegian"
 
 class RagChunk(Base):
     __tablename__ = "rag_chunks"
+    __table_args__ = (
+        Index("ix_rag_chunks_chunk_tsv", "chunk_tsv", postgresql_using="gin"),
+    )
     embedding: Mapped[list[float]] = mapped_column(Vector(EMBED_DIM))
     id: Mapped[int] = mapped_column(primary_key=True)
     doc_id: Mapped[str] = mapped_column(String(200), index=True)
     chunk_text: Mapped[str] = mapped_column(Text)
+    # sha256 of chunk_text; NULL for rows ingested before hashes were stored
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
     meta: Mapped[dict] = mapped_column(JSONB, default=dict)
+    # Generated by Postgres; deferred so ordinary chunk loads do not fetch it.
+    chunk_tsv: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{TS_CONFIG}', chunk_text)", persisted=True),
+        deferred=True,
+    )
+
+
+class RagDocument(Base):
+    """Latest ingested version of a document, used to skip unchanged re-ingests."""
+
+    __tablename__ = "rag_documents"
+
+    doc_id: Mapped[str] = mapped_column(String(200), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=1)
+    # sha256 of the full content plus chunking settings
+    content_hash: Mapped[str] = mapped_column(String(64))
+    chunk_count: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+    # sha256 of (model, text); see services.embedding_cache.cache_key
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    model: Mapped[str] = mapped_column(String(100))
+    embedding: Mapped[list[float]] = mapped_column(Vector(EMBED_DIM))
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    # queued | running | succeeded | failed
+    status: Mapped[str] = mapped_column(String(20), index=True, default="queued")
+    created_by: Mapped[str] = mapped_column(String(150), index=True)
+    files: Mapped[int] = mapped_column(Integer, default=0)
+    pages_extracted: Mapped[int] = mapped_column(Integer, default=0)
+    chunks_embedded: Mapped[int] = mapped_column(Integer, default=0)
+    rows_written: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+
+class IngestJobFile(Base):
+    """Uploaded file kept until its job finishes, so queued jobs survive a restart."""
+
+    __tablename__ = "ingest_job_files"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    job_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("ingest_jobs.id", ondelete="CASCADE"), index=True
+    )
+    filename: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    content_type: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
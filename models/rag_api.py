@@ -1,5 +1,7 @@
+from datetime import datetime
+
 from pydantic import BaseModel, Field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 
 class IngestItem(BaseModel):
@@ -12,15 +14,24 @@ class IngestRequest(BaseModel):
     items: List[IngestItem]
 
 
-class IngestResponse(BaseModel):
-    ok: bool
-    chunks_added: int
+class IngestJobStatus(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    files: int
+    pages_extracted: int
+    chunks_embedded: int
+    rows_written: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
 
 
 class AskRequest(BaseModel):
     question: str
     k: int = 5
     doc_id: Optional[str] = None
+    ef_search: Optional[int] = Field(default=None, ge=1, le=1000)
+    hybrid: bool = False
 
 
 class AskSource(BaseModel):
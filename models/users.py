@@ -1,4 +1,5 @@
 import hashlib
+import os
 
 from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr
@@ -17,6 +18,11 @@ class UserPublic(BaseModel):
     full_name: str | None = None
 
 
+class UserPage(BaseModel):
+    users: list[UserPublic]
+    next_cursor: str | None = None
+
+
 class UserUpdate(BaseModel):
     email: EmailStr | None = None
     full_name: str | None = None
@@ -31,7 +37,21 @@ class UserInDB(BaseModel):
     full_name: str | None = None
 
 
-_PWD_CONTEXT = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def get_bcrypt_rounds() -> int:
+    return int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+
+_pwd_context: CryptContext | None = None
+
+
+def _get_pwd_context() -> CryptContext:
+    # Built on first use so BCRYPT_ROUNDS from .env is picked up. Hashes with a
+    # different work factor count as outdated and are rehashed on the next
+    # successful login (see verify_and_update_password).
+    global _pwd_context
+    if _pwd_context is None:
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=get_bcrypt_rounds())
+    return _pwd_context
 
 
 def _normalize_password(raw_password: str) -> str:
@@ -43,9 +63,15 @@ def _normalize_password(raw_password: str) -> str:
 
 def hash_password(raw_password: str) -> str:
     normalized = _normalize_password(raw_password)
-    return _PWD_CONTEXT.hash(normalized)
+    return _get_pwd_context().hash(normalized)
 
 
 def verify_password(raw_password: str, password_hash: str) -> bool:
     normalized = _normalize_password(raw_password)
-    return _PWD_CONTEXT.verify(normalized, password_hash)
\ No newline at end of file
+    return _get_pwd_context().verify(normalized, password_hash)
+
+
+def verify_and_update_password(raw_password: str, password_hash: str) -> tuple[bool, str | None]:
+    """Verify a password and return a replacement hash if the stored one is outdated."""
+    normalized = _normalize_password(raw_password)
+    return _get_pwd_context().verify_and_update(normalized, password_hash)
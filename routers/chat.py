@@ -1,35 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+from urllib.parse import quote
+import httpx
+import json
+import logging
 import os
 from datetime import datetime
-from sqlalchemy import select
+from sqlalchemy import literal, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
-from database import get_session
-from models.scenario import Scenario
-from models.history import ChatSessionDB, ChatMessageDB, FeedbackRecord
+from database import get_session, get_sessionmaker
+from models.history import ChatSessionDB, ChatMessageDB, FeedbackJob, FeedbackRecord
 from services.chat_session_store import get_session_meta
 
-from auth import get_current_user, get_current_user_id
+from auth import Principal, get_current_user, get_current_user_id, get_principal
 from models.chat import (
     ChatMessageRequest,
     ChatMessageResponse,
     CreateSessionResponse,
-    CriterionScore,
+    FinishJobResponse,
     FinishRequest,
     FinishResponse,
-    Source,
     StoredMessage,
 )
 from services.chat_session_store import (
     add_message,
     create_session,
+    ensure_session,
+    evict_session,
     get_messages,
-    session_exists,
 )
-from services.openai_client import chat_complete_messages
-from services.feedback_pipeline import evaluate_conversation
+from services.openai_client import chat_complete_messages, chat_complete_messages_stream
+from services.chat_history import build_prompt
+from services.feedback_jobs import (
+    EmptySession,
+    EvaluationFailed,
+    SessionNotFound,
+    cached_feedback,
+    feedback_from_record,
+    finish_session,
+    submit_job as submit_feedback_job,
+)
+from services.scenario_cache import get_scenario as get_cached_scenario
+from services import stt_service
+from services.pagination import decode_cursor, encode_cursor
+from services.voice_pipeline import speak_sentences, split_sentences
+
+logger = logging.getLogger(__name__)
 
 
 class CreateSessionRequest(BaseModel):
@@ -45,6 +65,11 @@ class SessionSummary(BaseModel):
     total_score: Optional[int] = None
 
 
+class SessionPage(BaseModel):
+    sessions: List[SessionSummary]
+    next_cursor: Optional[str] = None
+
+
 class SessionDetail(BaseModel):
     session_id: str
     scenario_id: Optional[int]
@@ -52,6 +77,8 @@ class SessionDetail(BaseModel):
     created_at: datetime
     messages: List[StoredMessage]
     feedback: Optional[FinishResponse] = None
+    # Cursor for the next (older) page of messages; null when there are none.
+    next_cursor: Optional[str] = None
 
 
 router = APIRouter(prefix="/chat", tags=["chat"])
@@ -61,8 +88,7 @@ router = APIRouter(prefix="/chat", tags=["chat"])
 async def create_chat_session(
     req: Optional[CreateSessionRequest] = None,
     db: AsyncSession = Depends(get_session),
-    current_user: str = Depends(get_current_user),
-    current_user_id: int = Depends(get_current_user_id),
+    principal: Principal = Depends(get_principal),
 ):
     scenario_id = req.scenario_id if req else None
     title = req.title if req else None
@@ -70,7 +96,7 @@ async def create_chat_session(
 
     db_session = ChatSessionDB(
         id=session_id,
-        user_id=current_user_id,
+        user_id=principal.user_id,
         scenario_id=scenario_id,
         title=title,
     )
@@ -80,6 +106,40 @@ async def create_chat_session(
     return CreateSessionResponse(session_id=session_id)
 
 
+async def _build_chat_messages(db: AsyncSession, session_id: str) -> list[dict]:
+    base_system_prompt = os.getenv("CHAT_SYSTEM_PROMPT", "Du er en hjelpsom assistent.")
+    transcript = get_messages(session_id)
+
+    messages = [{"role": "system", "content": base_system_prompt}]
+
+    # hent scenario og legg inn scenario-system_prompt
+    scenario_id, _title = get_session_meta(session_id)
+    if scenario_id is not None:
+        scenario = await get_cached_scenario(db, scenario_id)
+        if scenario:
+            messages.extend(scenario.system_messages)
+
+    # legg til historikk innenfor token-budsjettet
+    return build_prompt(session_id, messages, transcript)
+
+
+async def _save_turn(db: AsyncSession, session_id: str, user_message: str, assistant: str) -> None:
+    # lagre assistant reply i minnet
+    add_message(session_id, "assistant", assistant)
+
+    # lagre begge meldinger i databasen
+    db.add(ChatMessageDB(session_id=session_id, role="user", content=user_message))
+    db.add(ChatMessageDB(session_id=session_id, role="assistant", content=assistant))
+    await db.commit()
+
+
+def _sse(data: dict, event: str | None = None) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+
 @router.post("/message", response_model=ChatMessageResponse)
 async def chat_message(
     req: ChatMessageRequest,
@@ -87,37 +147,14 @@ async def chat_message(
     current_user: str = Depends(get_current_user),
 ):
     _ = current_user
-    if not session_exists(req.session_id):
+    if not await ensure_session(db, req.session_id):
         raise HTTPException(status_code=404, detail="Unknown session_id. Call /chat/session first.")
 
     # 1) lagre user message i session
     add_message(req.session_id, "user", req.message)
 
     # 2) bygg meldingshistorikk til OpenAI
-    base_system_prompt = os.getenv("CHAT_SYSTEM_PROMPT", "Du er en hjelpsom assistent.")
-    transcript = get_messages(req.session_id)
-
-    messages = [{"role": "system", "content": base_system_prompt}]
-
-    # 2.1) hent scenario og legg inn scenario-system_prompt
-    scenario_id, _title = get_session_meta(req.session_id)
-    if scenario_id is not None:
-        result = await db.execute(select(Scenario).where(Scenario.id == scenario_id))
-        scenario = result.scalar_one_or_none()
-        if scenario and scenario.system_prompt:
-            messages.append({"role": "system", "content": scenario.system_prompt})
-            messages.append({
-                "role": "system",
-                "content": (
-                    f"Scenario: {scenario.title}\n"
-                    f"Beskrivelse: {scenario.description or ''}\n"
-                    f"Vanskelighetsgrad: {scenario.difficulty or ''}\n"
-                    f"Kategori: {scenario.category or ''}\n"
-                ).strip(),
-            })
-
-    # 2.2) legg til historikk
-    messages.extend([{"role": m.role, "content": m.content} for m in transcript])
+    messages = await _build_chat_messages(db, req.session_id)
 
     # 3) kall OpenAI
     try:
@@ -125,13 +162,8 @@ async def chat_message(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OpenAI-feil: {str(e)}")
 
-    # 4) lagre assistant reply i minnet
-    add_message(req.session_id, "assistant", assistant)
-
-    # 5) lagre begge meldinger i databasen
-    db.add(ChatMessageDB(session_id=req.session_id, role="user", content=req.message))
-    db.add(ChatMessageDB(session_id=req.session_id, role="assistant", content=assistant))
-    await db.commit()
+    # 4) lagre svaret i minnet og i databasen
+    await _save_turn(db, req.session_id, req.message, assistant)
 
     return ChatMessageResponse(
         session_id=req.session_id,
@@ -141,111 +173,283 @@ async def chat_message(
     )
 
 
-@router.post("/finish", response_model=FinishResponse)
-async def finish_chat(
-    req: FinishRequest,
+@router.post("/message/stream")
+async def chat_message_stream(
+    req: ChatMessageRequest,
     db: AsyncSession = Depends(get_session),
     current_user: str = Depends(get_current_user),
 ):
+    """Same turn as /chat/message, but relays tokens as Server-Sent Events.
+
+    Each token arrives as a ``data: {"delta": ...}`` event. The stream ends with
+    an ``event: done`` carrying the full ChatMessageResponse, or ``event: error``.
+    """
     _ = current_user
-    scenario_id: Optional[int] = None
+    if not await ensure_session(db, req.session_id):
+        raise HTTPException(status_code=404, detail="Unknown session_id. Call /chat/session first.")
 
-    if session_exists(req.session_id):
-        transcript = get_messages(req.session_id)
-        scenario_id, _title = get_session_meta(req.session_id)
-    else:
-        # Session not in memory (e.g. after a restart) — fall back to DB
-        db_sess_result = await db.execute(
-            select(ChatSessionDB).where(ChatSessionDB.id == req.session_id)
-        )
-        db_sess = db_sess_result.scalar_one_or_none()
-        if not db_sess:
-            raise HTTPException(status_code=404, detail="Session not found.")
-        scenario_id = db_sess.scenario_id
+    add_message(req.session_id, "user", req.message)
+    messages = await _build_chat_messages(db, req.session_id)
+
+    async def event_stream():
+        parts: list[str] = []
+        saved = False
+        try:
+            try:
+                async for delta in chat_complete_messages_stream(messages=messages):
+                    parts.append(delta)
+                    yield _sse({"delta": delta})
+            except Exception as e:
+                yield _sse({"detail": f"OpenAI-feil: {str(e)}"}, event="error")
+                return
+
+            assistant = "".join(parts)
+            # The request-scoped session may already be closed once streaming starts.
+            async with get_sessionmaker()() as stream_db:
+                await _save_turn(stream_db, req.session_id, req.message, assistant)
+            saved = True
+
+            done = ChatMessageResponse(
+                session_id=req.session_id,
+                assistant_message=assistant,
+                used_rag=False,
+                sources=[],
+            )
+            yield _sse(done.model_dump(), event="done")
+        finally:
+            if not saved:
+                # Error or client disconnect: the user turn is only in memory.
+                # Drop the copy so the next request rehydrates from the DB.
+                evict_session(req.session_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        msgs_result = await db.execute(
-            select(ChatMessageDB)
-            .where(ChatMessageDB.session_id == req.session_id)
-            .order_by(ChatMessageDB.id)
-        )
-        db_messages = msgs_result.scalars().all()
-        transcript = [StoredMessage(role=m.role, content=m.content) for m in db_messages]
 
-    if not transcript:
-        raise HTTPException(status_code=400, detail="Session has no messages.")
+@router.post("/voice")
+async def chat_voice(
+    session_id: str = Form(...),
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_session),
+    current_user: str = Depends(get_current_user),
+):
+    """One voice turn: transcribe, reply and stream the reply back as audio/mpeg.
 
-    scenario = None
-    if scenario_id is not None:
-        result = await db.execute(select(Scenario).where(Scenario.id == scenario_id))
-        scenario = result.scalar_one_or_none()
+    TTS starts on the first complete sentence while the rest of the reply is
+    still being generated. The transcript is returned URL-encoded in the
+    ``X-Transcript`` header; the turn is persisted like /chat/message once the
+    reply is complete.
+    """
+    _ = current_user
+    if not await ensure_session(db, session_id):
+        raise HTTPException(status_code=404, detail="Unknown session_id. Call /chat/session first.")
 
     try:
-        feedback = await evaluate_conversation(
-            session=db,
-            session_id=req.session_id,
-            messages=transcript,
-            scenario=scenario,
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Evalueringsfeil: {str(e)}")
+        transcript = await stt_service.transcribe(file.file, file.filename, file.content_type)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="Speech-to-text timed out")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Speech-to-text failed: {e}")
+    transcript = transcript.strip()
+    if not transcript:
+        raise HTTPException(status_code=400, detail="No speech detected.")
+
+    add_message(session_id, "user", transcript)
+    messages = await _build_chat_messages(db, session_id)
+
+    async def audio_stream():
+        parts: list[str] = []
+        completed = False
+        saved = False
+
+        async def deltas():
+            nonlocal completed
+            async for delta in chat_complete_messages_stream(messages=messages):
+                parts.append(delta)
+                yield delta
+            completed = True
+
+        try:
+            try:
+                async for chunk in speak_sentences(split_sentences(deltas())):
+                    yield chunk
+            except Exception:
+                # Headers are already sent; all we can do is end the audio early.
+                logger.exception("Voice turn failed for session %s", session_id)
+
+            if completed:
+                async with get_sessionmaker()() as stream_db:
+                    await _save_turn(stream_db, session_id, transcript, "".join(parts))
+                saved = True
+        finally:
+            if not saved:
+                # Same as /chat/message/stream: drop the unpersisted user turn.
+                evict_session(session_id)
+
+    return StreamingResponse(
+        audio_stream(),
+        media_type="audio/mpeg",
+        headers={"Cache-Control": "no-cache", "X-Transcript": quote(transcript)},
+    )
+
 
-    # Upsert feedback — avoid integrity error if /finish is called more than once
-    fb_result = await db.execute(
-        select(FeedbackRecord).where(FeedbackRecord.session_id == req.session_id)
+async def _job_response(db: AsyncSession, job: FeedbackJob) -> FinishJobResponse:
+    result = None
+    if job.status == "succeeded":
+        fb_result = await db.execute(
+            select(FeedbackRecord).where(FeedbackRecord.session_id == job.session_id)
+        )
+        fb = fb_result.scalar_one_or_none()
+        if fb:
+            result = feedback_from_record(fb)
+    return FinishJobResponse(
+        job_id=job.id,
+        session_id=job.session_id,
+        status=job.status,
+        error=job.error,
+        result=result,
     )
-    existing_fb = fb_result.scalar_one_or_none()
-    if existing_fb:
-        existing_fb.total_score = feedback.total_score
-        existing_fb.criteria = [c.model_dump() for c in feedback.criteria]
-        existing_fb.positive_feedback = feedback.positive_feedback
-        existing_fb.negative_feedback = feedback.negative_feedback
-        existing_fb.sources = [s.model_dump() for s in feedback.sources]
-    else:
-        db.add(FeedbackRecord(
-            session_id=req.session_id,
-            total_score=feedback.total_score,
-            criteria=[c.model_dump() for c in feedback.criteria],
-            positive_feedback=feedback.positive_feedback,
-            negative_feedback=feedback.negative_feedback,
-            sources=[s.model_dump() for s in feedback.sources],
-        ))
-    await db.commit()
 
-    return feedback
+
+@router.post(
+    "/finish",
+    response_model=FinishResponse,
+    responses={202: {"model": FinishJobResponse}},
+)
+async def finish_chat(
+    req: FinishRequest,
+    db: AsyncSession = Depends(get_session),
+    current_user: str = Depends(get_current_user),
+):
+    _ = current_user
+
+    if req.background:
+        if not await ensure_session(db, req.session_id):
+            raise HTTPException(status_code=404, detail="Session not found.")
+        if not get_messages(req.session_id):
+            raise HTTPException(status_code=400, detail="Session has no messages.")
+        feedback = await cached_feedback(db, req.session_id)
+        if feedback is not None:
+            return feedback
+        job = await submit_feedback_job(db, req.session_id)
+        job_response = await _job_response(db, job)
+        return JSONResponse(status_code=202, content=job_response.model_dump(mode="json"))
+
+    try:
+        return await finish_session(db, req.session_id)
+    except SessionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except EmptySession as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except EvaluationFailed as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/finish/{job_id}", response_model=FinishJobResponse)
+async def finish_job_status(
+    job_id: str,
+    db: AsyncSession = Depends(get_session),
+    current_user_id: int = Depends(get_current_user_id),
+):
+    result = await db.execute(
+        select(FeedbackJob)
+        .join(ChatSessionDB, ChatSessionDB.id == FeedbackJob.session_id)
+        .where(FeedbackJob.id == job_id, ChatSessionDB.user_id == current_user_id)
+    )
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Evaluation job not found.")
+    return await _job_response(db, job)
 
 
-@router.get("/sessions", response_model=List[SessionSummary])
+@router.get("/sessions", response_model=SessionPage)
 async def list_sessions(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_session),
     current_user_id: int = Depends(get_current_user_id),
 ):
-    result = await db.execute(
-        select(ChatSessionDB, FeedbackRecord.total_score)
+    """The user's sessions, newest first, one page at a time.
+
+    Pass ``next_cursor`` from the previous page as ``cursor`` to continue; it is
+    null on the last page.
+    """
+    stmt = (
+        select(
+            ChatSessionDB.id,
+            ChatSessionDB.scenario_id,
+            ChatSessionDB.title,
+            ChatSessionDB.created_at,
+            FeedbackRecord.total_score,
+        )
         .outerjoin(FeedbackRecord, ChatSessionDB.id == FeedbackRecord.session_id)
         .where(ChatSessionDB.user_id == current_user_id)
-        .order_by(ChatSessionDB.created_at.desc())
+        .order_by(ChatSessionDB.created_at.desc(), ChatSessionDB.id.desc())
+        .limit(limit + 1)
     )
-    rows = result.all()
-    return [
-        SessionSummary(
-            session_id=chat_session.id,
-            scenario_id=chat_session.scenario_id,
-            title=chat_session.title,
-            created_at=chat_session.created_at,
-            total_score=total_score,
+    if cursor:
+        try:
+            after_created_at, after_id = decode_cursor(cursor, datetime, str)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        stmt = stmt.where(
+            tuple_(ChatSessionDB.created_at, ChatSessionDB.id)
+            < tuple_(
+                literal(after_created_at, ChatSessionDB.created_at.type),
+                literal(after_id, ChatSessionDB.id.type),
+            )
         )
-        for chat_session, total_score in rows
-    ]
+
+    rows = (await db.execute(stmt)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return SessionPage(
+        sessions=[
+            SessionSummary(
+                session_id=row.id,
+                scenario_id=row.scenario_id,
+                title=row.title,
+                created_at=row.created_at,
+                total_score=row.total_score,
+            )
+            for row in rows
+        ],
+        next_cursor=next_cursor,
+    )
 
 
 @router.get("/session/{session_id}", response_model=SessionDetail)
 async def get_session_detail(
     session_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_session),
     current_user_id: int = Depends(get_current_user_id),
 ):
+    """A session with its feedback and one page of messages.
+
+    Pages run from the newest messages backwards; each page is returned in
+    chronological order. Pass ``next_cursor`` as ``cursor`` to load older ones.
+    """
+    before_id = None
+    if cursor:
+        try:
+            (before_id,) = decode_cursor(cursor, int)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    # sesjon og feedback i én spørring
     result = await db.execute(
-        select(ChatSessionDB).where(
+        select(ChatSessionDB)
+        .options(joinedload(ChatSessionDB.feedback))
+        .where(
             ChatSessionDB.id == session_id,
             ChatSessionDB.user_id == current_user_id,
         )
@@ -254,29 +458,24 @@ async def get_session_detail(
     if not chat_session:
         raise HTTPException(status_code=404, detail="Session not found.")
 
-    msgs_result = await db.execute(
-        select(ChatMessageDB)
+    msgs_stmt = (
+        select(ChatMessageDB.id, ChatMessageDB.role, ChatMessageDB.content)
         .where(ChatMessageDB.session_id == session_id)
-        .order_by(ChatMessageDB.id)
+        .order_by(ChatMessageDB.id.desc())
+        .limit(limit + 1)
     )
-    db_messages = msgs_result.scalars().all()
-    messages = [StoredMessage(role=m.role, content=m.content) for m in db_messages]
+    if before_id is not None:
+        msgs_stmt = msgs_stmt.where(ChatMessageDB.id < before_id)
+    rows = (await db.execute(msgs_stmt)).all()
 
-    fb_result = await db.execute(
-        select(FeedbackRecord).where(FeedbackRecord.session_id == session_id)
-    )
-    fb = fb_result.scalar_one_or_none()
-
-    feedback = None
-    if fb:
-        feedback = FinishResponse(
-            session_id=session_id,
-            total_score=fb.total_score,
-            criteria=[CriterionScore(**c) for c in fb.criteria],
-            positive_feedback=fb.positive_feedback,
-            negative_feedback=fb.negative_feedback,
-            sources=[Source(**s) for s in fb.sources],
-        )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    messages = [StoredMessage(role=row.role, content=row.content) for row in reversed(rows)]
+
+    fb = chat_session.feedback
+    feedback = feedback_from_record(fb) if fb else None
 
     return SessionDetail(
         session_id=chat_session.id,
@@ -285,4 +484,5 @@ async def get_session_detail(
         created_at=chat_session.created_at,
         messages=messages,
         feedback=feedback,
+        next_cursor=next_cursor,
     )
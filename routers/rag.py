@@ -1,72 +1,74 @@
-from io import BytesIO
-
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
-from pypdf import PdfReader
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from auth import get_current_user
 from database import get_session
-from models.rag_api import IngestResponse, AskRequest, AskResponse, AskSource
-from services.rag_pipeline import ingest_documents, answer_question
+from models.rag import IngestJob
+from models.rag_api import IngestJobStatus, AskRequest, AskResponse, AskSource
+from services.ingest_jobs import get_job, is_pdf, submit_job
+from services.rag_pipeline import answer_question
 
 
 router = APIRouter(prefix="/rag", tags=["rag"])
 
 
-def _extract_upload_text(file: UploadFile, raw: bytes) -> str:
-    filename = (file.filename or "").lower()
-    is_pdf = file.content_type == "application/pdf" or filename.endswith(".pdf")
-
-    if is_pdf:
-        reader = PdfReader(BytesIO(raw))
-        pages = [page.extract_text() or "" for page in reader.pages]
-        text = "\n".join(pages).strip()
-        if not text:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File '{file.filename or 'unknown'}' does not contain extractable text",
-            )
-        return text
-
-    try:
-        return raw.decode("utf-8")
-    except UnicodeDecodeError:
-        raise HTTPException(
-            status_code=400,
-            detail=(
-                f"File '{file.filename or 'unknown'}' is not supported. "
-                "Use UTF-8 text files or PDFs."
-            ),
-        )
+def _to_status(job: IngestJob) -> IngestJobStatus:
+    return IngestJobStatus(
+        job_id=job.id,
+        status=job.status,
+        files=job.files,
+        pages_extracted=job.pages_extracted,
+        chunks_embedded=job.chunks_embedded,
+        rows_written=job.rows_written,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
 
 
-@router.post("/ingest", response_model=IngestResponse)
+@router.post("/ingest", response_model=IngestJobStatus, status_code=status.HTTP_202_ACCEPTED)
 async def rag_ingest(
     files: list[UploadFile] = File(...),
     session: AsyncSession = Depends(get_session),
     current_user: str = Depends(get_current_user),
 ):
-    _ = current_user
-    items = []
+    """Queue uploaded files for ingestion and return the job to poll."""
+    uploads = []
     for file in files:
         raw = await file.read()
         if not raw:
             continue
-        content = _extract_upload_text(file=file, raw=raw)
+        # Reject unreadable text files up front; PDFs are checked by the job.
+        if not is_pdf(file.filename, file.content_type):
+            try:
+                raw.decode("utf-8")
+            except UnicodeDecodeError:
+                raise HTTPException(
+                    status_code=400,
+                    detail=(
+                        f"File '{file.filename or 'unknown'}' is not supported. "
+                        "Use UTF-8 text files or PDFs."
+                    ),
+                )
+        uploads.append((file.filename, file.content_type, raw))
+
+    if not uploads:
+        raise HTTPException(status_code=400, detail="No non-empty files were provided")
 
-        doc_id = file.filename or "uploaded_document"
-        meta = {
-            "filename": file.filename,
-            "content_type": file.content_type,
-            "source": file.filename,
-        }
-        items.append((doc_id, content, meta))
+    job = await submit_job(session, uploads, created_by=current_user)
+    return _to_status(job)
 
-    if not items:
-        raise HTTPException(status_code=400, detail="No non-empty files were provided")
 
-    chunks_added = await ingest_documents(session=session, items=items)
-    return IngestResponse(ok=True, chunks_added=chunks_added)
+@router.get("/ingest/{job_id}", response_model=IngestJobStatus)
+async def rag_ingest_status(
+    job_id: str,
+    session: AsyncSession = Depends(get_session),
+    current_user: str = Depends(get_current_user),
+):
+    job = await get_job(session, job_id)
+    if not job or job.created_by != current_user:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return _to_status(job)
 
 
 @router.post("/ask", response_model=AskResponse)
@@ -77,7 +79,14 @@ async def rag_ask(
 ):
     _ = current_user
     try:
-        answer, sources = await answer_question(session=session, question=req.question, k=req.k, doc_id=req.doc_id)
+        answer, sources = await answer_question(
+            session=session,
+            question=req.question,
+            k=req.k,
+            doc_id=req.doc_id,
+            ef_search=req.ef_search,
+            hybrid=req.hybrid,
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from auth import get_current_user
 from database import get_session
 from models.scenario import Scenario
+from services import scenario_cache
 
 
 class ScenarioCreate(BaseModel):
@@ -111,6 +112,7 @@ async def create_scenario(
 	session.add(scenario)
 	await session.commit()
 	await session.refresh(scenario)
+	scenario_cache.invalidate(scenario.id)
 	return _to_public(scenario)
 
 
@@ -145,5 +147,6 @@ async def update_scenario(
 		scenario.is_active = scenario_in.is_active
 
 	await session.commit()
+	scenario_cache.invalidate(scenario_id)
 	await session.refresh(scenario)
 	return _to_public(scenario)
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 
-from services.tts_service import text_to_speech_stream
+from services.tts_service import get_cached_audio, text_to_speech_stream
 
 
 router = APIRouter(prefix="/tts", tags=["tts"])
@@ -16,5 +16,8 @@ class TTSRequest(BaseModel):
 async def speak(req: TTSRequest):
     if not req.text.strip():
         raise HTTPException(status_code=400, detail="Text cannot be empty")
+    cached = await get_cached_audio(req.text)
+    if cached is not None:
+        return FileResponse(cached, media_type="audio/mpeg")
     audio_stream = text_to_speech_stream(req.text)
     return StreamingResponse(audio_stream, media_type="audio/mpeg")
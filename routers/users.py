@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import or_, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -7,21 +7,52 @@ from auth import create_access_token, get_current_user
 from database import get_session
 from models.db import User
 from models.login import LoginRequest, LoginResponse
-from models.users import UserCreate, UserPublic, UserUpdate, hash_password, verify_password
+from models.users import UserCreate, UserPage, UserPublic, UserUpdate
+from services.pagination import decode_cursor, encode_cursor
+from services.passwords import hash_password_async, verify_password_async
 
 router = APIRouter()
 
-@router.get("/users/", response_model=list[UserPublic])
+@router.get("/users/", response_model=UserPage)
 async def read_users(
+    q: str | None = Query(None, description="Username or email prefix"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
     session: AsyncSession = Depends(get_session),
     current_user: str = Depends(get_current_user)  # Authentication required
 ):
-    result = await session.execute(select(User))
-    users = result.scalars().all()
-    return [
-        UserPublic(username=user.username, email=user.email, full_name=user.full_name)
-        for user in users
-    ]
+    # Only the public columns are selected; password_hash is never loaded.
+    stmt = (
+        select(User.id, User.username, User.email, User.full_name)
+        .order_by(User.id)
+        .limit(limit + 1)
+    )
+    if q:
+        stmt = stmt.where(
+            or_(
+                User.username.startswith(q, autoescape=True),
+                User.email.startswith(q, autoescape=True),
+            )
+        )
+    if cursor:
+        try:
+            (after_id,) = decode_cursor(cursor, int)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        stmt = stmt.where(User.id > after_id)
+
+    rows = (await session.execute(stmt)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    return UserPage(
+        users=[
+            UserPublic(username=row.username, email=row.email, full_name=row.full_name)
+            for row in rows
+        ],
+        next_cursor=next_cursor,
+    )
 
 
 @router.post("/register", response_model=UserPublic, status_code=status.HTTP_201_CREATED)
@@ -30,7 +61,7 @@ async def register_user(user_in: UserCreate, session: AsyncSession = Depends(get
         username=user_in.username,
         email=user_in.email,
         full_name=user_in.full_name,
-        password_hash=hash_password(user_in.password),
+        password_hash=await hash_password_async(user_in.password),
     )
     session.add(user)
     try:
@@ -67,7 +98,7 @@ async def update_user(
     if user_in.full_name is not None:
         user.full_name = user_in.full_name
     if user_in.password is not None:
-        user.password_hash = hash_password(user_in.password)
+        user.password_hash = await hash_password_async(user_in.password)
     try:
         await session.commit()
     except IntegrityError:
@@ -86,8 +117,13 @@ async def login_user(credentials: LoginRequest, session: AsyncSession = Depends(
     user = result.scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    if not verify_password(credentials.password, user.password_hash):
+    valid, new_hash = await verify_password_async(credentials.password, user.password_hash)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        # The work factor changed since this password was stored
+        user.password_hash = new_hash
+        await session.commit()
     access_token = create_access_token(subject=user.username, user_id=user.id)
     return LoginResponse(
         access_token=access_token,
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+from models.chat import StoredMessage
+from services.openai_client import chat_complete
+from services.tokenizer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Rough per-message cost of the chat format (role, separators).
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_SYSTEM_PROMPT = (
+    "Du oppsummerer en treningssamtale mellom en forelder (Bruker) og et barn (AI-karakter). "
+    "Skriv et kort, nøytralt sammendrag på norsk av hva som er sagt og hvordan stemningen har "
+    "utviklet seg, slik at samtalen kan fortsette naturlig. Ikke vurder forelderen. "
+    "Maks 150 ord."
+)
+
+
+@dataclass(frozen=True)
+class _Summary:
+    covered: int  # number of leading transcript messages folded into text
+    text: str
+
+
+_summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+_summaries_lock = threading.Lock()
+_refreshing: set[str] = set()
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _history_budget() -> int:
+    return int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000"))
+
+
+def _max_summaries() -> int:
+    # Separate from the session store's limits: a summary is small and is kept
+    # when its session is evicted, so a rehydrated session need not be re-summarized.
+    return int(os.getenv("CHAT_SUMMARY_MAX_COUNT", "5000"))
+
+
+def _message_tokens(msg: StoredMessage) -> int:
+    return count_tokens(msg.content) + _MESSAGE_OVERHEAD_TOKENS
+
+
+def _format_turns(messages: List[StoredMessage]) -> str:
+    lines = []
+    for m in messages:
+        role = "Bruker" if m.role == "user" else "AI-karakter"
+        lines.append(f"{role}: {m.content}")
+    return "\n".join(lines)
+
+
+def _get_summary(session_id: str) -> Optional[_Summary]:
+    with _summaries_lock:
+        summary = _summaries.get(session_id)
+        if summary is not None:
+            _summaries.move_to_end(session_id)
+        return summary
+
+
+def _store_summary(session_id: str, summary: _Summary) -> None:
+    with _summaries_lock:
+        current = _summaries.get(session_id)
+        if current is not None and current.covered > summary.covered:
+            return
+        _summaries[session_id] = summary
+        _summaries.move_to_end(session_id)
+        while len(_summaries) > _max_summaries():
+            _summaries.popitem(last=False)
+
+
+def forget(session_id: str) -> None:
+    with _summaries_lock:
+        _summaries.pop(session_id, None)
+
+
+async def _refresh_summary(
+    session_id: str,
+    older: List[StoredMessage],
+    previous: Optional[_Summary],
+) -> None:
+    try:
+        if previous is not None and previous.covered <= len(older):
+            start = previous.covered
+            prefix = f"Tidligere sammendrag:\n{previous.text}\n\n"
+        else:
+            start = 0
+            prefix = ""
+        user = f"{prefix}Nye replikker:\n{_format_turns(older[start:])}"
+        text = await chat_complete(system=SUMMARY_SYSTEM_PROMPT, user=user, temperature=0.2)
+        if text.strip():
+            _store_summary(session_id, _Summary(covered=len(older), text=text.strip()))
+    except Exception:
+        logger.warning("Oppsummering av samtale %s feilet.", session_id, exc_info=True)
+    finally:
+        _refreshing.discard(session_id)
+
+
+def _schedule_refresh(
+    session_id: str,
+    older: List[StoredMessage],
+    previous: Optional[_Summary],
+) -> None:
+    if session_id in _refreshing:
+        return
+    _refreshing.add(session_id)
+    task = asyncio.create_task(_refresh_summary(session_id, older, previous))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def build_prompt(
+    session_id: str,
+    system_messages: List[dict],
+    transcript: List[StoredMessage],
+) -> List[dict]:
+    """System messages, a rolling summary of older turns, then the newest turns.
+
+    The newest turns are kept within CHAT_HISTORY_TOKEN_BUDGET (the latest message
+    is always included). Turns that fall out of the window are folded into a
+    summary refreshed in the background, so a turn may briefly use a summary that
+    lags a few messages behind.
+    """
+    budget = _history_budget()
+    window_start = len(transcript)
+    used = 0
+    while window_start > 0:
+        cost = _message_tokens(transcript[window_start - 1])
+        if used + cost > budget and window_start < len(transcript):
+            break
+        used += cost
+        window_start -= 1
+
+    messages = list(system_messages)
+    if window_start > 0:
+        summary = _get_summary(session_id)
+        if summary is not None:
+            messages.append({
+                "role": "system",
+                "content": f"Sammendrag av samtalen så langt:\n{summary.text}",
+            })
+        if summary is None or summary.covered < window_start:
+            _schedule_refresh(session_id, transcript[:window_start], summary)
+
+    messages.extend({"role": m.role, "content": m.content} for m in transcript[window_start:])
+    return messages
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import os
 import threading
-from dataclasses import dataclass
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple
 from uuid import uuid4
 
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from models.chat import StoredMessage
+from models.history import ChatMessageDB, ChatSessionDB
 
 
 @dataclass
@@ -13,19 +21,94 @@ class ChatSession:
     scenario_id: Optional[int]
     title: Optional[str]
     messages: List[StoredMessage]
+    last_access: float = field(default_factory=time.monotonic)
+    size_bytes: int = 0
 
 
-_sessions: Dict[str, ChatSession] = {}
+# Least recently used first. Every session can be rebuilt from chat_sessions /
+# chat_messages, so eviction only costs a DB read on the next touch.
+_sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
 _sessions_lock = threading.Lock()
+_total_bytes = 0
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "rehydrations": 0}
+
+
+def _max_sessions() -> int:
+    return int(os.getenv("CHAT_SESSION_MAX_COUNT", "1000"))
+
+
+def _max_bytes() -> int:
+    # 0 disables the byte budget and leaves only the count and idle limits.
+    return int(os.getenv("CHAT_SESSION_MAX_BYTES", "0"))
+
+
+def _idle_ttl_seconds() -> float:
+    return float(os.getenv("CHAT_SESSION_IDLE_TTL_SECONDS", "3600"))
+
+
+def _message_size(content: str) -> int:
+    return len(content.encode("utf-8"))
+
+
+def _pop_locked(session_id: str) -> Optional[ChatSession]:
+    global _total_bytes
+    s = _sessions.pop(session_id, None)
+    if s is not None:
+        _total_bytes -= s.size_bytes
+    return s
+
+
+def _evict_locked(keep: str | None = None) -> None:
+    """Drop idle or least recently used sessions until all limits hold.
+
+    ``keep`` is never evicted, so the session a caller is about to use stays put.
+    """
+    now = time.monotonic()
+    idle_ttl = _idle_ttl_seconds()
+    max_sessions = _max_sessions()
+    max_bytes = _max_bytes()
+    while _sessions:
+        oldest_id, oldest = next(iter(_sessions.items()))
+        if oldest_id == keep:
+            if len(_sessions) == 1:
+                break
+            _sessions.move_to_end(oldest_id)
+            continue
+        over_count = len(_sessions) > max_sessions
+        over_bytes = max_bytes > 0 and _total_bytes > max_bytes
+        idle = now - oldest.last_access > idle_ttl
+        if not (over_count or over_bytes or idle):
+            break
+        _pop_locked(oldest_id)
+        _stats["evictions"] += 1
+
+
+def _insert_locked(session_id: str, session: ChatSession) -> None:
+    global _total_bytes
+    _sessions[session_id] = session
+    _sessions.move_to_end(session_id)
+    _total_bytes += session.size_bytes
+    _evict_locked(keep=session_id)
+
+
+def _touch_locked(session_id: str) -> Optional[ChatSession]:
+    s = _sessions.get(session_id)
+    if s is not None:
+        s.last_access = time.monotonic()
+        _sessions.move_to_end(session_id)
+    return s
 
 
 def create_session(scenario_id: int | None = None, title: str | None = None) -> str:
     session_id = str(uuid4())
     with _sessions_lock:
-        _sessions[session_id] = ChatSession(
-            scenario_id=scenario_id,
-            title=title,
-            messages=[],
+        _insert_locked(
+            session_id,
+            ChatSession(
+                scenario_id=scenario_id,
+                title=title,
+                messages=[],
+            ),
         )
     return session_id
 
@@ -35,17 +118,148 @@ def session_exists(session_id: str) -> bool:
         return session_id in _sessions
 
 
+async def _rehydrate(db: AsyncSession, session_id: str) -> bool:
+    db_sess_result = await db.execute(
+        select(ChatSessionDB).where(ChatSessionDB.id == session_id)
+    )
+    db_sess = db_sess_result.scalar_one_or_none()
+    if not db_sess:
+        return False
+
+    msgs_result = await db.execute(
+        select(ChatMessageDB.role, ChatMessageDB.content)
+        .where(ChatMessageDB.session_id == session_id)
+        .order_by(ChatMessageDB.id)
+    )
+    messages = [StoredMessage(role=role, content=content) for role, content in msgs_result.all()]
+
+    with _sessions_lock:
+        # Another request may have rehydrated it while we were awaiting the DB.
+        if _touch_locked(session_id) is None:
+            _insert_locked(
+                session_id,
+                ChatSession(
+                    scenario_id=db_sess.scenario_id,
+                    title=db_sess.title,
+                    messages=messages,
+                    size_bytes=sum(_message_size(m.content) for m in messages),
+                ),
+            )
+            _stats["rehydrations"] += 1
+    return True
+
+
+class SessionBackend(ABC):
+    """Decides when the in-process copy of a session can be served as-is."""
+
+    name = "base"
+
+    @abstractmethod
+    async def ensure_session(self, db: AsyncSession, session_id: str) -> bool:
+        """Load or validate the session; False if it does not exist."""
+
+
+class MemorySessionBackend(SessionBackend):
+    """This process is the only writer; the DB is read only after an eviction.
+
+    Only correct with a single worker, since other workers never see its turns.
+    """
+
+    name = "memory"
+
+    async def ensure_session(self, db: AsyncSession, session_id: str) -> bool:
+        with _sessions_lock:
+            if _touch_locked(session_id) is not None:
+                _stats["hits"] += 1
+                return True
+            _stats["misses"] += 1
+        return await _rehydrate(db, session_id)
+
+
+class PostgresSessionBackend(SessionBackend):
+    """chat_sessions/chat_messages are the shared source of truth.
+
+    The in-process copy is a read-through cache that is validated against the
+    persisted message count on every touch, so turns written by another worker
+    are picked up before the next prompt is built.
+    """
+
+    name = "postgres"
+
+    async def ensure_session(self, db: AsyncSession, session_id: str) -> bool:
+        persisted = await db.scalar(
+            select(func.count(ChatMessageDB.id)).where(ChatMessageDB.session_id == session_id)
+        )
+        with _sessions_lock:
+            s = _touch_locked(session_id)
+            if s is not None and len(s.messages) == persisted:
+                _stats["hits"] += 1
+                return True
+            if s is not None:
+                _pop_locked(session_id)
+                _stats["stale"] += 1
+            _stats["misses"] += 1
+        return await _rehydrate(db, session_id)
+
+
+_BACKENDS = {
+    MemorySessionBackend.name: MemorySessionBackend,
+    PostgresSessionBackend.name: PostgresSessionBackend,
+}
+_backend: SessionBackend | None = None
+
+
+def get_backend() -> SessionBackend:
+    global _backend
+    if _backend is None:
+        name = os.getenv("CHAT_SESSION_BACKEND", "memory").lower()
+        backend_cls = _BACKENDS.get(name)
+        if backend_cls is None:
+            raise RuntimeError(
+                f"Unknown CHAT_SESSION_BACKEND '{name}'. Use one of: {', '.join(_BACKENDS)}"
+            )
+        _backend = backend_cls()
+    return _backend
+
+
+async def ensure_session(db: AsyncSession, session_id: str) -> bool:
+    """Make sure an up-to-date copy of the session is in memory.
+
+    Returns False when the session is unknown both in memory and in the DB.
+    """
+    return await get_backend().ensure_session(db, session_id)
+
+
+def evict_session(session_id: str) -> None:
+    """Release a session from memory, e.g. once it has been finished."""
+    with _sessions_lock:
+        if _pop_locked(session_id) is not None:
+            _stats["evictions"] += 1
+
+
 def add_message(session_id: str, role: str, content: str) -> None:
+    """Append to the in-memory copy of a session.
+
+    If the session was evicted in the meantime (e.g. while waiting on OpenAI)
+    this is a no-op: callers persist the turn to the DB, and the next
+    ensure_session rehydrates the full session from there.
+    """
+    global _total_bytes
     msg = StoredMessage(role=role, content=content)
+    size = _message_size(content)
     with _sessions_lock:
-        if session_id not in _sessions:
-            _sessions[session_id] = ChatSession(scenario_id=None, title=None, messages=[])
-        _sessions[session_id].messages.append(msg)
+        s = _touch_locked(session_id)
+        if s is None:
+            return
+        s.messages.append(msg)
+        s.size_bytes += size
+        _total_bytes += size
+        _evict_locked(keep=session_id)
 
 
 def get_messages(session_id: str) -> List[StoredMessage]:
     with _sessions_lock:
-        s = _sessions.get(session_id)
+        s = _touch_locked(session_id)
         return list(s.messages) if s else []
 
 
@@ -55,3 +269,13 @@ def get_session_meta(session_id: str) -> Tuple[int | None, str | None]:
         if not s:
             return None, None
         return s.scenario_id, s.title
+
+
+def get_stats() -> Dict[str, int | str]:
+    with _sessions_lock:
+        return {
+            **_stats,
+            "backend": get_backend().name,
+            "sessions": len(_sessions),
+            "bytes": _total_bytes,
+        }
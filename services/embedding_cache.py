@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from database import get_sessionmaker
+from models.rag import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Vectors are kept as float32 arrays (pgvector's storage precision), roughly
+# 6 KB per 1536-dim embedding instead of ~50 KB as a list of Python floats.
+_memory: "OrderedDict[str, array]" = OrderedDict()
+_memory_lock = threading.Lock()
+_stats: Dict[str, int] = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+
+def _max_entries() -> int:
+    return int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "5000"))
+
+
+def _persist_enabled() -> bool:
+    return os.getenv("EMBEDDING_CACHE_PERSIST", "false").lower() == "true"
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _remember(entries: Dict[str, List[float]]) -> None:
+    max_entries = _max_entries()
+    if max_entries <= 0:
+        return
+    with _memory_lock:
+        for key, vector in entries.items():
+            _memory[key] = array("f", vector)
+            _memory.move_to_end(key)
+        while len(_memory) > max_entries:
+            _memory.popitem(last=False)
+
+
+async def get_many(keys: List[str]) -> Dict[str, List[float]]:
+    """Look up cached vectors, memory tier first and then the DB tier if enabled."""
+    found: Dict[str, List[float]] = {}
+    with _memory_lock:
+        for key in keys:
+            vector = _memory.get(key)
+            if vector is not None:
+                _memory.move_to_end(key)
+                found[key] = vector.tolist()
+    _stats["memory_hits"] += len(found)
+
+    remaining = [k for k in dict.fromkeys(keys) if k not in found]
+    if remaining and _persist_enabled():
+        try:
+            async with get_sessionmaker()() as session:
+                res = await session.execute(
+                    select(EmbeddingCacheEntry.key, EmbeddingCacheEntry.embedding).where(
+                        EmbeddingCacheEntry.key.in_(remaining)
+                    )
+                )
+                from_db = {key: list(embedding) for key, embedding in res.all()}
+        except Exception:
+            logger.warning("Embedding cache lookup failed; embedding without cache.", exc_info=True)
+            from_db = {}
+        _stats["db_hits"] += len(from_db)
+        _remember(from_db)
+        found.update(from_db)
+
+    _stats["misses"] += len(set(keys) - found.keys())
+    return found
+
+
+async def put_many(model: str, entries: Dict[str, List[float]]) -> None:
+    if not entries:
+        return
+    _remember(entries)
+    if not _persist_enabled():
+        return
+    try:
+        async with get_sessionmaker()() as session:
+            stmt = insert(EmbeddingCacheEntry).values(
+                [{"key": key, "model": model, "embedding": vector} for key, vector in entries.items()]
+            )
+            await session.execute(stmt.on_conflict_do_nothing(index_elements=["key"]))
+            await session.commit()
+    except Exception:
+        logger.warning("Could not persist embeddings to the cache table.", exc_info=True)
+
+
+def get_stats() -> Dict[str, int]:
+    with _memory_lock:
+        return {**_stats, "entries": len(_memory)}
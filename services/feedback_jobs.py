@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import List
+from uuid import uuid4
+
+from sqlalchemy import func, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_sessionmaker
+from models.chat import CriterionScore, FinishResponse, Source
+from models.history import FeedbackJob, FeedbackRecord
+from services.chat_history import forget as forget_summary
+from services.chat_session_store import ensure_session, evict_session, get_messages, get_session_meta
+from services.feedback_pipeline import evaluate_conversation, evaluation_key
+from services.scenario_cache import get_scenario
+
+logger = logging.getLogger(__name__)
+
+
+class SessionNotFound(LookupError):
+    pass
+
+
+class EmptySession(ValueError):
+    pass
+
+
+class EvaluationFailed(RuntimeError):
+    pass
+
+
+_queue: asyncio.Queue[str] | None = None
+_workers: List[asyncio.Task] = []
+_sweeper: asyncio.Task | None = None
+# Jobs this process has claimed and not yet finished; kept fresh by the
+# heartbeat and put back in the queue on shutdown.
+_claimed: set[str] = set()
+
+
+def _max_concurrent_jobs() -> int:
+    return int(os.getenv("FEEDBACK_MAX_CONCURRENT_JOBS", "4"))
+
+
+def _stale_after_seconds() -> int:
+    return int(os.getenv("FEEDBACK_STALE_AFTER_SECONDS", "300"))
+
+
+def _heartbeat_seconds() -> float:
+    return max(1.0, _stale_after_seconds() / 3)
+
+
+def feedback_from_record(fb: FeedbackRecord) -> FinishResponse:
+    return FinishResponse(
+        session_id=fb.session_id,
+        total_score=fb.total_score,
+        criteria=[CriterionScore(**c) for c in fb.criteria],
+        positive_feedback=fb.positive_feedback,
+        negative_feedback=fb.negative_feedback,
+        sources=[Source(**s) for s in fb.sources],
+    )
+
+
+async def _load_feedback(db: AsyncSession, session_id: str) -> FeedbackRecord | None:
+    fb_result = await db.execute(
+        select(FeedbackRecord).where(FeedbackRecord.session_id == session_id)
+    )
+    return fb_result.scalar_one_or_none()
+
+
+def _release_session(session_id: str) -> None:
+    # Finished sessions no longer need to occupy memory
+    evict_session(session_id)
+    forget_summary(session_id)
+
+
+async def cached_feedback(db: AsyncSession, session_id: str) -> FinishResponse | None:
+    """Stored feedback, if it was computed from the session as it is now.
+
+    The session must already be loaded with ensure_session.
+    """
+    fb = await _load_feedback(db, session_id)
+    if fb is None or fb.eval_key is None:
+        return None
+    scenario_id, _title = get_session_meta(session_id)
+    if fb.eval_key != evaluation_key(get_messages(session_id), scenario_id):
+        return None
+    return feedback_from_record(fb)
+
+
+async def store_feedback(
+    db: AsyncSession,
+    session_id: str,
+    feedback: FinishResponse,
+    eval_key: str | None = None,
+) -> None:
+    # Upsert feedback — avoid integrity error if /finish is called more than once
+    existing_fb = await _load_feedback(db, session_id)
+    if existing_fb:
+        existing_fb.eval_key = eval_key
+        existing_fb.total_score = feedback.total_score
+        existing_fb.criteria = [c.model_dump() for c in feedback.criteria]
+        existing_fb.positive_feedback = feedback.positive_feedback
+        existing_fb.negative_feedback = feedback.negative_feedback
+        existing_fb.sources = [s.model_dump() for s in feedback.sources]
+    else:
+        db.add(FeedbackRecord(
+            session_id=session_id,
+            total_score=feedback.total_score,
+            criteria=[c.model_dump() for c in feedback.criteria],
+            positive_feedback=feedback.positive_feedback,
+            negative_feedback=feedback.negative_feedback,
+            sources=[s.model_dump() for s in feedback.sources],
+            eval_key=eval_key,
+        ))
+    await db.commit()
+
+
+async def finish_session(db: AsyncSession, session_id: str) -> FinishResponse:
+    """Evaluate the session transcript, store the FeedbackRecord and release the session.
+
+    Raises SessionNotFound, EmptySession or EvaluationFailed.
+    """
+    # Rehydrates from the DB if the session was evicted or the worker restarted
+    if not await ensure_session(db, session_id):
+        raise SessionNotFound("Session not found.")
+    transcript = get_messages(session_id)
+    scenario_id, _title = get_session_meta(session_id)
+
+    if not transcript:
+        raise EmptySession("Session has no messages.")
+
+    # Retries of an unchanged session reuse the stored evaluation
+    eval_key = evaluation_key(transcript, scenario_id)
+    existing_fb = await _load_feedback(db, session_id)
+    if existing_fb is not None and existing_fb.eval_key == eval_key:
+        _release_session(session_id)
+        return feedback_from_record(existing_fb)
+
+    scenario = None
+    if scenario_id is not None:
+        scenario = await get_scenario(db, scenario_id)
+
+    try:
+        feedback = await evaluate_conversation(
+            session=db,
+            session_id=session_id,
+            messages=transcript,
+            scenario=scenario,
+        )
+    except Exception as e:
+        raise EvaluationFailed(f"Evalueringsfeil: {str(e)}") from e
+
+    await store_feedback(db, session_id, feedback, eval_key=eval_key)
+    _release_session(session_id)
+    return feedback
+
+
+async def submit_job(db: AsyncSession, session_id: str) -> FeedbackJob:
+    """Queue an evaluation, reusing one that is already pending for the session.
+
+    A running job counts as pending only while its worker keeps heartbeating.
+    """
+    pending = await db.execute(
+        select(FeedbackJob)
+        .where(
+            FeedbackJob.session_id == session_id,
+            or_(
+                FeedbackJob.status == "queued",
+                (FeedbackJob.status == "running")
+                & (
+                    FeedbackJob.updated_at
+                    >= text(f"now() - interval '{_stale_after_seconds()} seconds'")
+                ),
+            ),
+        )
+        .order_by(FeedbackJob.created_at.desc())
+        .limit(1)
+    )
+    job = pending.scalar_one_or_none()
+    if job is not None:
+        return job
+
+    job = FeedbackJob(id=str(uuid4()), session_id=session_id, status="queued")
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+
+    if _queue is not None:
+        _queue.put_nowait(job.id)
+    else:
+        logger.warning("Feedback workers are not running; job %s stays queued until startup.", job.id)
+    return job
+
+
+async def get_job(db: AsyncSession, job_id: str) -> FeedbackJob | None:
+    result = await db.execute(select(FeedbackJob).where(FeedbackJob.id == job_id))
+    return result.scalar_one_or_none()
+
+
+async def _run_job(job_id: str) -> None:
+    async with get_sessionmaker()() as db:
+        # Claim atomically so two processes never run the same job.
+        claimed = await db.execute(
+            update(FeedbackJob)
+            .where(FeedbackJob.id == job_id, FeedbackJob.status == "queued")
+            .values(status="running")
+            .returning(FeedbackJob.session_id)
+        )
+        session_id = claimed.scalar_one_or_none()
+        if session_id is None:
+            await db.rollback()
+            return
+        await db.commit()
+        _claimed.add(job_id)
+
+        cancelled = False
+        try:
+            try:
+                await finish_session(db, session_id)
+            except Exception as e:
+                logger.error("Feedback job %s failed: %s", job_id, e, exc_info=True)
+                await db.rollback()
+                status, error = "failed", str(e)
+            else:
+                status, error = "succeeded", None
+
+            await db.execute(
+                update(FeedbackJob).where(FeedbackJob.id == job_id).values(status=status, error=error)
+            )
+            await db.commit()
+        except asyncio.CancelledError:
+            # Shutdown: stays claimed so stop_workers can put it back in the queue.
+            cancelled = True
+            raise
+        finally:
+            if not cancelled:
+                _claimed.discard(job_id)
+
+
+async def _worker() -> None:
+    assert _queue is not None
+    while True:
+        job_id = await _queue.get()
+        try:
+            await _run_job(job_id)
+        except Exception:
+            logger.error("Feedback worker crashed on job %s", job_id, exc_info=True)
+        finally:
+            _queue.task_done()
+
+
+async def _requeue_stale(db: AsyncSession) -> List[str]:
+    """Put running jobs whose worker stopped heartbeating back in the queue."""
+    result = await db.execute(
+        update(FeedbackJob)
+        .where(
+            FeedbackJob.status == "running",
+            FeedbackJob.updated_at
+            < text(f"now() - interval '{_stale_after_seconds()} seconds'"),
+        )
+        .values(status="queued")
+        .returning(FeedbackJob.id)
+    )
+    job_ids = list(result.scalars().all())
+    await db.commit()
+    return job_ids
+
+
+async def _recover_jobs() -> List[str]:
+    async with get_sessionmaker()() as db:
+        await _requeue_stale(db)
+        result = await db.execute(
+            select(FeedbackJob.id).where(FeedbackJob.status == "queued").order_by(FeedbackJob.created_at)
+        )
+        return list(result.scalars().all())
+
+
+async def _heartbeat_and_sweep() -> None:
+    """Keep this process's running jobs fresh and pick up jobs whose worker died."""
+    while True:
+        await asyncio.sleep(_heartbeat_seconds())
+        try:
+            async with get_sessionmaker()() as db:
+                if _claimed:
+                    await db.execute(
+                        update(FeedbackJob)
+                        .where(FeedbackJob.id.in_(list(_claimed)), FeedbackJob.status == "running")
+                        .values(updated_at=func.now())
+                    )
+                    await db.commit()
+                for job_id in await _requeue_stale(db):
+                    if _queue is not None:
+                        _queue.put_nowait(job_id)
+        except Exception:
+            logger.warning("Feedback job heartbeat failed.", exc_info=True)
+
+
+async def start_workers() -> None:
+    global _queue, _sweeper
+    if _queue is not None:
+        return
+    _queue = asyncio.Queue()
+    for job_id in await _recover_jobs():
+        _queue.put_nowait(job_id)
+    for _ in range(_max_concurrent_jobs()):
+        _workers.append(asyncio.create_task(_worker()))
+    _sweeper = asyncio.create_task(_heartbeat_and_sweep())
+
+
+async def stop_workers() -> None:
+    """Stop the workers and hand the jobs they were running back to the queue."""
+    global _queue, _sweeper
+    tasks = _workers + ([_sweeper] if _sweeper is not None else [])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _workers.clear()
+    _sweeper = None
+    _queue = None
+    if _claimed:
+        try:
+            async with get_sessionmaker()() as db:
+                await db.execute(
+                    update(FeedbackJob)
+                    .where(FeedbackJob.id.in_(list(_claimed)), FeedbackJob.status == "running")
+                    .values(status="queued")
+                )
+                await db.commit()
+        except Exception:
+            logger.warning("Could not re-queue interrupted feedback jobs.", exc_info=True)
+        _claimed.clear()
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
 import os
 from typing import Any
@@ -8,13 +10,20 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.chat import CriterionScore, FinishResponse, Source, StoredMessage
 from models.scenario import Scenario
-from services.openai_client import chat_complete_json, embed_query
-from services.rag_store import search_similar
+from services.openai_client import chat_complete_json, embed_query, get_chat_model
+from services.rag_store import search_hybrid, search_similar
+from services.scenario_cache import CachedScenario
 
 logger = logging.getLogger(__name__)
 
 FEEDBACK_RAG_DOC_ID = os.getenv("FEEDBACK_RAG_DOC_ID", "samtalemetodikk_foreldre_rag.pdf")
 
+
+def _hybrid_search_enabled() -> bool:
+    # Read per call: main.py loads .env after this module is imported.
+    return os.getenv("FEEDBACK_HYBRID_SEARCH", "false").lower() == "true"
+
+
 EVAL_SYSTEM_PROMPT = """Du er en ekspert-evaluator for treningssamtaler mellom foreldre og barn.
 
 Din oppgave er å evaluere samtalen mot 4 faste kriterier. \
@@ -64,6 +73,37 @@ Regler:
 """
 
 
+# Bump when scoring rules change in a way EVAL_SYSTEM_PROMPT does not capture,
+# so stored evaluations are recomputed on the next /chat/finish.
+RUBRIC_VERSION = "1"
+
+
+def evaluation_key(
+    messages: list[StoredMessage], scenario_id: int | None, hybrid: bool | None = None
+) -> str:
+    """Identifies an evaluation: same key means re-running it would be wasted work.
+
+    ``hybrid`` is the retrieval mode passed to evaluate_conversation; None means
+    the FEEDBACK_HYBRID_SEARCH setting.
+    """
+    if hybrid is None:
+        hybrid = _hybrid_search_enabled()
+    payload = json.dumps(
+        {
+            "transcript": [[m.role, m.content] for m in messages],
+            "scenario_id": scenario_id,
+            "rubric": RUBRIC_VERSION,
+            "prompt": hashlib.sha256(EVAL_SYSTEM_PROMPT.encode("utf-8")).hexdigest(),
+            "model": get_chat_model(),
+            "rag_doc_id": FEEDBACK_RAG_DOC_ID,
+            "hybrid": hybrid,
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 def _build_transcript(messages: list[StoredMessage]) -> str:
     lines = []
     for m in messages:
@@ -164,22 +204,33 @@ async def evaluate_conversation(
     session: AsyncSession,
     session_id: str,
     messages: list[StoredMessage],
-    scenario: Scenario | None,
+    scenario: Scenario | CachedScenario | None,
+    hybrid: bool | None = None,
 ) -> FinishResponse:
     # 1. Bygg søkequery fra brukerens meldinger
     search_query = _build_search_query(messages)
 
     # 2. Hent relevante fagdokumenter fra pgvector
     rows = []
+    use_hybrid = _hybrid_search_enabled() if hybrid is None else hybrid
     if search_query.strip():
         try:
             q_emb = await embed_query(search_query)
-            rows = await search_similar(
-                session=session,
-                query_embedding=q_emb,
-                k=5,
-                doc_id=FEEDBACK_RAG_DOC_ID,
-            )
+            if use_hybrid:
+                rows = await search_hybrid(
+                    session=session,
+                    query_embedding=q_emb,
+                    query_text=search_query,
+                    k=5,
+                    doc_id=FEEDBACK_RAG_DOC_ID,
+                )
+            else:
+                rows = await search_similar(
+                    session=session,
+                    query_embedding=q_emb,
+                    k=5,
+                    doc_id=FEEDBACK_RAG_DOC_ID,
+                )
         except Exception:
             logger.warning("pgvector-søk feilet, fortsetter uten dokumentkontekst.", exc_info=True)
 
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import List, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database import get_sessionmaker
+from models.rag import IngestJob, IngestJobFile
+from services.pdf_text import extract_pdf
+from services.rag_pipeline import ingest_documents
+
+logger = logging.getLogger(__name__)
+
+UploadedFile = Tuple[Optional[str], Optional[str], bytes]  # (filename, content_type, raw)
+
+_queue: asyncio.Queue[str] | None = None
+_workers: List[asyncio.Task] = []
+_sweeper: asyncio.Task | None = None
+# Jobs this process has claimed and not yet finished; kept fresh by the
+# heartbeat and put back in the queue on shutdown.
+_claimed: set[str] = set()
+
+
+def _max_concurrent_jobs() -> int:
+    return int(os.getenv("INGEST_MAX_CONCURRENT_JOBS", "2"))
+
+
+def _stale_after_seconds() -> int:
+    # A running job whose heartbeat is older than this is assumed to belong to
+    # a worker that died, and is queued again by the periodic sweep.
+    return int(os.getenv("INGEST_STALE_AFTER_SECONDS", "900"))
+
+
+def _heartbeat_seconds() -> float:
+    return max(1.0, _stale_after_seconds() / 3)
+
+
+def is_pdf(filename: str | None, content_type: str | None) -> bool:
+    return content_type == "application/pdf" or (filename or "").lower().endswith(".pdf")
+
+
+async def extract_file_text(filename: str | None, content_type: str | None, raw: bytes) -> Tuple[str, int]:
+    """Return (text, pages). Plain-text files count as a single page.
+
+    Raises ValueError with a user-facing message for unsupported or empty files.
+    """
+    if is_pdf(filename, content_type):
+        content, n_pages = await extract_pdf(raw)
+        if not content:
+            raise ValueError(f"File '{filename or 'unknown'}' does not contain extractable text")
+        return content, n_pages
+
+    try:
+        return raw.decode("utf-8"), 1
+    except UnicodeDecodeError:
+        raise ValueError(
+            f"File '{filename or 'unknown'}' is not supported. Use UTF-8 text files or PDFs."
+        )
+
+
+async def submit_job(db: AsyncSession, files: List[UploadedFile], created_by: str) -> IngestJob:
+    job = IngestJob(
+        id=str(uuid4()),
+        status="queued",
+        created_by=created_by,
+        files=len(files),
+        pages_extracted=0,
+        chunks_embedded=0,
+        rows_written=0,
+    )
+    db.add(job)
+    for filename, content_type, raw in files:
+        db.add(IngestJobFile(job_id=job.id, filename=filename, content_type=content_type, data=raw))
+    await db.commit()
+    await db.refresh(job)
+
+    if _queue is not None:
+        _queue.put_nowait(job.id)
+    else:
+        logger.warning("Ingest workers are not running; job %s stays queued until startup.", job.id)
+    return job
+
+
+async def get_job(db: AsyncSession, job_id: str) -> IngestJob | None:
+    result = await db.execute(select(IngestJob).where(IngestJob.id == job_id))
+    return result.scalar_one_or_none()
+
+
+async def _bump(job_id: str, **counters: int) -> None:
+    values = {name: getattr(IngestJob, name) + n for name, n in counters.items()}
+    async with get_sessionmaker()() as db:
+        await db.execute(update(IngestJob).where(IngestJob.id == job_id).values(**values))
+        await db.commit()
+
+
+async def _finish(job_id: str, status: str, error: str | None = None) -> None:
+    async with get_sessionmaker()() as db:
+        await db.execute(
+            update(IngestJob).where(IngestJob.id == job_id).values(status=status, error=error)
+        )
+        await db.execute(delete(IngestJobFile).where(IngestJobFile.job_id == job_id))
+        await db.commit()
+
+
+async def _run_job(job_id: str) -> None:
+    sessionmaker = get_sessionmaker()
+    async with sessionmaker() as db:
+        # Claim atomically so two processes never run the same job.
+        claimed = await db.execute(
+            update(IngestJob)
+            .where(IngestJob.id == job_id, IngestJob.status == "queued")
+            # A re-queued job starts over, so its progress counters do too.
+            .values(status="running", pages_extracted=0, chunks_embedded=0, rows_written=0)
+            .returning(IngestJob.id)
+        )
+        if claimed.scalar_one_or_none() is None:
+            await db.rollback()
+            return
+        await db.commit()
+    _claimed.add(job_id)
+
+    cancelled = False
+    try:
+        await _process_job(sessionmaker, job_id)
+    except asyncio.CancelledError:
+        # Shutdown: stays claimed so stop_workers can put it back in the queue.
+        cancelled = True
+        raise
+    finally:
+        if not cancelled:
+            _claimed.discard(job_id)
+
+
+async def _process_job(sessionmaker: async_sessionmaker[AsyncSession], job_id: str) -> None:
+    async with sessionmaker() as db:
+        files_result = await db.execute(
+            select(IngestJobFile).where(IngestJobFile.job_id == job_id).order_by(IngestJobFile.id)
+        )
+        files = list(files_result.scalars().all())
+
+    try:
+        items = []
+        for f in files:
+            content, n_pages = await extract_file_text(f.filename, f.content_type, f.data)
+            await _bump(job_id, pages_extracted=n_pages)
+            doc_id = f.filename or "uploaded_document"
+            meta = {
+                "filename": f.filename,
+                "content_type": f.content_type,
+                "source": f.filename,
+            }
+            items.append((doc_id, content, meta))
+        del files
+
+        async def on_embedded(n: int) -> None:
+            await _bump(job_id, chunks_embedded=n)
+
+        async def on_written(n: int) -> None:
+            await _bump(job_id, rows_written=n)
+
+        async with sessionmaker() as db:
+            await ingest_documents(
+                session=db, items=items, on_embedded=on_embedded, on_written=on_written
+            )
+    except Exception as e:
+        logger.error("Ingest job %s failed: %s", job_id, e, exc_info=True)
+        await _finish(job_id, "failed", str(e))
+        return
+    await _finish(job_id, "succeeded")
+
+
+async def _worker() -> None:
+    assert _queue is not None
+    while True:
+        job_id = await _queue.get()
+        try:
+            await _run_job(job_id)
+        except Exception:
+            logger.error("Ingest worker crashed on job %s", job_id, exc_info=True)
+        finally:
+            _queue.task_done()
+
+
+async def _requeue_stale(db: AsyncSession) -> List[str]:
+    """Put running jobs whose worker stopped heartbeating back in the queue."""
+    result = await db.execute(
+        update(IngestJob)
+        .where(
+            IngestJob.status == "running",
+            IngestJob.updated_at
+            < text(f"now() - interval '{_stale_after_seconds()} seconds'"),
+        )
+        .values(status="queued")
+        .returning(IngestJob.id)
+    )
+    job_ids = list(result.scalars().all())
+    await db.commit()
+    return job_ids
+
+
+async def _recover_jobs() -> List[str]:
+    async with get_sessionmaker()() as db:
+        await _requeue_stale(db)
+        result = await db.execute(
+            select(IngestJob.id).where(IngestJob.status == "queued").order_by(IngestJob.created_at)
+        )
+        return list(result.scalars().all())
+
+
+async def _heartbeat_and_sweep() -> None:
+    """Keep this process's running jobs fresh and pick up jobs whose worker died."""
+    while True:
+        await asyncio.sleep(_heartbeat_seconds())
+        try:
+            async with get_sessionmaker()() as db:
+                if _claimed:
+                    await db.execute(
+                        update(IngestJob)
+                        .where(IngestJob.id.in_(list(_claimed)), IngestJob.status == "running")
+                        .values(updated_at=func.now())
+                    )
+                    await db.commit()
+                for job_id in await _requeue_stale(db):
+                    if _queue is not None:
+                        _queue.put_nowait(job_id)
+        except Exception:
+            logger.warning("Ingest job heartbeat failed.", exc_info=True)
+
+
+async def start_workers() -> None:
+    global _queue, _sweeper
+    if _queue is not None:
+        return
+    _queue = asyncio.Queue()
+    for job_id in await _recover_jobs():
+        _queue.put_nowait(job_id)
+    for _ in range(_max_concurrent_jobs()):
+        _workers.append(asyncio.create_task(_worker()))
+    _sweeper = asyncio.create_task(_heartbeat_and_sweep())
+
+
+async def stop_workers() -> None:
+    """Stop the workers and hand the jobs they were running back to the queue."""
+    global _queue, _sweeper
+    tasks = _workers + ([_sweeper] if _sweeper is not None else [])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _workers.clear()
+    _sweeper = None
+    _queue = None
+    if _claimed:
+        try:
+            async with get_sessionmaker()() as db:
+                await db.execute(
+                    update(IngestJob)
+                    .where(IngestJob.id.in_(list(_claimed)), IngestJob.status == "running")
+                    .values(status="queued")
+                )
+                await db.commit()
+        except Exception:
+            logger.warning("Could not re-queue interrupted ingest jobs.", exc_info=True)
+        _claimed.clear()
@@ -1,15 +1,62 @@
+import asyncio
 import json
 import os
-from typing import List
+from typing import AsyncIterator, List
 
+import httpx
 from openai import AsyncOpenAI
 
+from services import embedding_cache
+
+
+_openai_client: AsyncOpenAI | None = None
+_request_semaphore: asyncio.Semaphore | None = None
+
+
+def _max_concurrency() -> int:
+    return int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+
 
 def _client() -> AsyncOpenAI:
+    """Return the process-wide client, creating it on first use.
+
+    Reusing one client keeps the HTTP connection pool (and its TLS sessions)
+    alive between chat turns instead of reconnecting on every call.
+    """
+    global _openai_client
+    if _openai_client is not None:
+        return _openai_client
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY is not set")
-    return AsyncOpenAI(api_key=api_key)
+    max_connections = _max_concurrency()
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60")),
+        ),
+        timeout=httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60")), connect=10.0),
+    )
+    _openai_client = AsyncOpenAI(api_key=api_key, http_client=http_client)
+    return _openai_client
+
+
+def _limiter() -> asyncio.Semaphore:
+    """Caps the number of in-flight upstream requests for this process."""
+    global _request_semaphore
+    if _request_semaphore is None:
+        _request_semaphore = asyncio.Semaphore(_max_concurrency())
+    return _request_semaphore
+
+
+async def close_client() -> None:
+    global _openai_client, _request_semaphore
+    client = _openai_client
+    _openai_client = None
+    _request_semaphore = None
+    if client is not None:
+        await client.close()
 
 
 def get_embedding_model() -> str:
@@ -27,14 +74,34 @@ def get_chat_model() -> str:
     )
 
 
-async def embed_texts(texts: List[str]) -> List[List[float]]:
+async def _embed_upstream(model: str, texts: List[str]) -> List[List[float]]:
     client = _client()
-    model = get_embedding_model()
-    resp = await client.embeddings.create(model=model, input=texts)
+    async with _limiter():
+        resp = await client.embeddings.create(model=model, input=texts)
     # Keep order stable
     return [d.embedding for d in resp.data]
 
 
+async def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Embed texts, sending only cache misses upstream. Output order matches input."""
+    model = get_embedding_model()
+    keys = [embedding_cache.cache_key(model, t) for t in texts]
+    found = await embedding_cache.get_many(keys)
+
+    missing: dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+
+    if missing:
+        vectors = await _embed_upstream(model, list(missing.values()))
+        fresh = dict(zip(missing.keys(), vectors))
+        await embedding_cache.put_many(model, fresh)
+        found.update(fresh)
+
+    return [found[key] for key in keys]
+
+
 async def embed_query(text: str) -> List[float]:
     return (await embed_texts([text]))[0]
 
@@ -53,7 +120,8 @@ async def chat_complete(system: str, user: str, temperature: float = 0.4) -> str
     if not model.startswith(("o1", "o3", "o4", "gpt-5")):
         kwargs["temperature"] = temperature
     
-    resp = await client.chat.completions.create(**kwargs)
+    async with _limiter():
+        resp = await client.chat.completions.create(**kwargs)
     return resp.choices[0].message.content or ""
 
 async def chat_complete_messages(
@@ -67,22 +135,47 @@ async def chat_complete_messages(
     if not model.startswith(("o1", "o3", "o4", "gpt-5")):
         kwargs["temperature"] = temperature
     
-    resp = await client.chat.completions.create(**kwargs)
+    async with _limiter():
+        resp = await client.chat.completions.create(**kwargs)
     return resp.choices[0].message.content or ""
 
 
+async def chat_complete_messages_stream(
+    messages: list[dict[str, str]],
+    temperature: float = 0.4,
+) -> AsyncIterator[str]:
+    """Yield content deltas as they arrive from the streaming API."""
+    client = _client()
+    model = get_chat_model()
+
+    kwargs = {"model": model, "messages": messages, "stream": True}
+    if not model.startswith(("o1", "o3", "o4", "gpt-5")):
+        kwargs["temperature"] = temperature
+
+    # The slot is held for the whole stream, not just until the first byte.
+    async with _limiter():
+        stream = await client.chat.completions.create(**kwargs)
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
 async def chat_complete_json(system: str, user: str) -> dict:
     """Kaller OpenAI med JSON mode – returnerer alltid et dict."""
     client = _client()
     model = get_chat_model()
-    resp = await client.chat.completions.create(
-        model=model,
-        response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-    )
+    async with _limiter():
+        resp = await client.chat.completions.create(
+            model=model,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+        )
     content = resp.choices[0].message.content
 
     if content is None or not str(content).strip():
@@ -0,0 +1,45 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from models.users import hash_password, verify_and_update_password
+
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _max_workers() -> int:
+    # bcrypt releases the GIL, so threads hash in parallel up to this limit.
+    return max(1, int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1))))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=_max_workers(), thread_name_prefix="bcrypt")
+    return _executor
+
+
+async def hash_password_async(raw_password: str) -> str:
+    """hash_password in the bounded hashing pool instead of on the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), hash_password, raw_password)
+
+
+async def verify_password_async(raw_password: str, password_hash: str) -> tuple[bool, str | None]:
+    """verify_and_update_password in the bounded hashing pool.
+
+    Returns (valid, new_hash); new_hash is set when the stored hash should be
+    replaced, e.g. after BCRYPT_ROUNDS changed.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), verify_and_update_password, raw_password, password_hash
+    )
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
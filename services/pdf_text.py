@@ -0,0 +1,107 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from pypdf import PdfReader
+
+
+_executor: ProcessPoolExecutor | None = None
+
+# Worker-process side: the last document parsed, so the page ranges of one PDF
+# that land on the same worker parse it only once.
+_worker_reader: tuple[str, PdfReader] | None = None
+
+
+def _max_workers() -> int:
+    # 0 runs extraction in the default thread pool instead of separate processes.
+    return int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def _pages_per_task() -> int:
+    return max(1, int(os.getenv("PDF_PAGES_PER_TASK", "20")))
+
+
+def _get_executor() -> ProcessPoolExecutor | None:
+    global _executor
+    if _executor is None and _max_workers() > 0:
+        # The API process runs several threads (asyncio, to_thread, bcrypt pool);
+        # forking it could copy a held lock into the child, so workers are spawned.
+        _executor = ProcessPoolExecutor(
+            max_workers=_max_workers(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _reader_for(source: bytes | str) -> PdfReader:
+    global _worker_reader
+    if isinstance(source, bytes):
+        return PdfReader(BytesIO(source))
+    if _worker_reader is None or _worker_reader[0] != source:
+        _worker_reader = (source, PdfReader(source))
+    return _worker_reader[1]
+
+
+def _page_count(source: bytes | str) -> int:
+    return len(_reader_for(source).pages)
+
+
+def _extract_range(source: bytes | str, start: int, stop: int) -> str:
+    # ``source`` is the raw PDF (thread pool) or a temp file path (worker processes).
+    reader = _reader_for(source)
+    return "\n".join((reader.pages[i].extract_text() or "") for i in range(start, stop))
+
+
+def _write_temp(raw: bytes) -> str:
+    fd, path = tempfile.mkstemp(prefix="pdf_extract_", suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(raw)
+    return path
+
+
+def _remove(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+async def extract_pdf_text(raw: bytes) -> str:
+    """Extract text from a PDF off the event loop, page ranges in parallel.
+
+    The result is identical to joining every page's text with newlines.
+    """
+    text, _n_pages = await extract_pdf(raw)
+    return text
+
+
+async def extract_pdf(raw: bytes) -> tuple[str, int]:
+    """Like extract_pdf_text, but also returns the number of pages read."""
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    # Worker processes get the PDF through a temp file instead of having the
+    # bytes pickled into every page-range task.
+    source: bytes | str = raw if executor is None else await asyncio.to_thread(_write_temp, raw)
+    try:
+        n_pages = await loop.run_in_executor(executor, _page_count, source)
+        per_task = _pages_per_task()
+        parts = await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, _extract_range, source, start, min(start + per_task, n_pages))
+                for start in range(0, n_pages, per_task)
+            )
+        )
+    finally:
+        if isinstance(source, str):
+            await asyncio.to_thread(_remove, source)
+    return "\n".join(parts).strip(), n_pages
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -1,17 +1,32 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple
+import asyncio
+import hashlib
+import os
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from services.openai_client import chat_complete, embed_query, embed_texts
-from services.rag_store import insert_chunks, search_similar
+from services.openai_client import chat_complete, embed_query, embed_texts, get_embedding_model
+from services.rag_store import (
+    delete_chunks,
+    document_locks,
+    get_chunk_hashes,
+    get_documents,
+    insert_chunks,
+    search_hybrid,
+    search_similar,
+    upsert_document,
+)
+from services.text_splitter import iter_chunks_with_tokens
 
 
 def split_text(text: str, chunk_size: int = 1200, chunk_overlap: int = 200) -> List[str]:
-    """Simple character-based splitter (good enough for v1).
+    """Simple character-based splitter.
 
-    You can swap this with a tokenizer-based splitter later.
+    Ingestion uses services.text_splitter instead; this is kept for callers
+    that want fixed character windows and as the benchmark baseline.
     """
     if chunk_size <= 0:
         raise ValueError("chunk_size must be > 0")
@@ -36,26 +51,192 @@ def split_text(text: str, chunk_size: int = 1200, chunk_overlap: int = 200) -> L
     return chunks
 
 
+def _embed_batch_max_items() -> int:
+    return int(os.getenv("EMBED_BATCH_MAX_ITEMS", "256"))
+
+
+def _embed_batch_max_tokens() -> int:
+    # The embeddings endpoint rejects requests above ~300k input tokens.
+    return int(os.getenv("EMBED_BATCH_MAX_TOKENS", "200000"))
+
+
+def _embed_concurrency() -> int:
+    return int(os.getenv("EMBED_CONCURRENT_REQUESTS", "4"))
+
+
+ProgressCallback = Callable[[int], Awaitable[None]]
+
+
+async def embed_chunks(
+    chunks: Iterable[Tuple[str, int]],
+    on_batch: Optional[ProgressCallback] = None,
+) -> Tuple[List[str], List[List[float]]]:
+    """Embed (chunk, token_count) pairs as they are produced.
+
+    Chunks are packed into requests bounded by EMBED_BATCH_MAX_ITEMS and
+    EMBED_BATCH_MAX_TOKENS, and each request is started as soon as its batch is
+    full, so embedding overlaps with the rest of the chunking. At most
+    EMBED_CONCURRENT_REQUESTS run at once. ``on_batch`` is awaited with the
+    batch size after each batch is embedded.
+
+    Returns the chunk texts and their embeddings, in input order.
+    """
+    max_items = _embed_batch_max_items()
+    max_tokens = _embed_batch_max_tokens()
+    semaphore = asyncio.Semaphore(_embed_concurrency())
+
+    async def run(batch: List[str]) -> List[List[float]]:
+        async with semaphore:
+            vectors = await embed_texts(batch)
+        if on_batch is not None:
+            await on_batch(len(batch))
+        return vectors
+
+    texts: List[str] = []
+    tasks: List[asyncio.Task] = []
+    batch_start = 0
+    batch_tokens = 0
+    try:
+        for chunk, n_tokens in chunks:
+            batch_len = len(texts) - batch_start
+            if batch_len and (batch_len >= max_items or batch_tokens + n_tokens > max_tokens):
+                tasks.append(asyncio.create_task(run(texts[batch_start:])))
+                batch_start = len(texts)
+                batch_tokens = 0
+                # Let the new request go out before chunking continues.
+                await asyncio.sleep(0)
+            texts.append(chunk)
+            batch_tokens += n_tokens
+        if len(texts) > batch_start:
+            tasks.append(asyncio.create_task(run(texts[batch_start:])))
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    return texts, [vector for vectors in results for vector in vectors]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _DocPlan:
+    doc_id: str
+    content: str
+    meta: Dict[str, Any]
+    doc_hash: str
+    known: Dict[str, int]  # content_hash -> chunk id already stored
+    stale_ids: List[int]  # rows without a hash (pre-hash ingests) or with a duplicate hash
+    seen: set = field(default_factory=set)
+    new_hashes: List[str] = field(default_factory=list)
+
+
 async def ingest_documents(
     session: AsyncSession,
     items: List[Tuple[str, str, Dict[str, Any]]],
-    chunk_size: int = 1200,
-    chunk_overlap: int = 200,
+    max_tokens: int = 300,
+    overlap_tokens: int = 50,
+    on_embedded: Optional[ProgressCallback] = None,
+    on_written: Optional[ProgressCallback] = None,
 ) -> int:
     """Ingest (doc_id, content, meta) items into the pgvector store.
 
+    Re-ingesting a doc_id is incremental: chunks are matched by content hash, so
+    only new chunks are embedded and inserted and only chunks that disappeared
+    are deleted. A document whose content and chunking settings are unchanged
+    is skipped without chunking. If the same doc_id appears twice, the last
+    item wins. Concurrent ingests of the same doc_id run one after the other
+    (Postgres advisory lock per doc_id).
+
+    Chunks from all items are embedded together so small documents share
+    requests and large ones are split across several. The optional callbacks
+    receive the number of chunks embedded / rows written as work progresses.
+
     Returns:
-        int: Number of chunks ingested.
+        int: Number of new chunks written.
     """
-    total_chunks = 0
-    for doc_id, content, meta in items:
-        chunks = split_text(content, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-        if not chunks:
+    latest = {doc_id: (doc_id, content, meta) for doc_id, content, meta in items}
+    doc_ids = list(latest)
+    # Concurrent ingests of the same doc_id would both insert its new chunks.
+    async with document_locks(session, doc_ids):
+        return await _ingest_locked(
+            session, latest, max_tokens, overlap_tokens, on_embedded, on_written
+        )
+
+
+async def _ingest_locked(
+    session: AsyncSession,
+    latest: Dict[str, Tuple[str, str, Dict[str, Any]]],
+    max_tokens: int,
+    overlap_tokens: int,
+    on_embedded: Optional[ProgressCallback],
+    on_written: Optional[ProgressCallback],
+) -> int:
+    doc_ids = list(latest)
+    stored_chunks = await get_chunk_hashes(session, doc_ids)
+    documents = await get_documents(session, doc_ids)
+    settings = f"{get_embedding_model()}:{max_tokens}:{overlap_tokens}"
+
+    plans: List[_DocPlan] = []
+    for doc_id, content, meta in latest.values():
+        doc_hash = content_hash(f"{settings}\0{content}")
+        document = documents.get(doc_id)
+        if document is not None and document.content_hash == doc_hash:
             continue
-        embeddings = await embed_texts(chunks)
-        await insert_chunks(session=session, doc_id=doc_id, chunks=chunks, embeddings=embeddings, meta=meta)
-        total_chunks += len(chunks)
-    return total_chunks
+        known: Dict[str, int] = {}
+        stale_ids: List[int] = []
+        for chunk_id, h in stored_chunks.get(doc_id, []):
+            if h is None or h in known:
+                stale_ids.append(chunk_id)
+            else:
+                known[h] = chunk_id
+        plans.append(
+            _DocPlan(
+                doc_id=doc_id,
+                content=content,
+                meta=meta,
+                doc_hash=doc_hash,
+                known=known,
+                stale_ids=stale_ids,
+            )
+        )
+
+    def new_chunks():
+        for plan in plans:
+            for chunk, n_tokens in iter_chunks_with_tokens(plan.content, max_tokens, overlap_tokens):
+                h = content_hash(chunk)
+                if h in plan.seen:
+                    continue
+                plan.seen.add(h)
+                if h in plan.known:
+                    continue
+                plan.new_hashes.append(h)
+                yield chunk, n_tokens
+
+    all_texts, all_embeddings = await embed_chunks(new_chunks(), on_batch=on_embedded)
+
+    offset = 0
+    for plan in plans:
+        n = len(plan.new_hashes)
+        removed = [chunk_id for h, chunk_id in plan.known.items() if h not in plan.seen]
+        await delete_chunks(session, removed + plan.stale_ids)
+        if n:
+            await insert_chunks(
+                session=session,
+                doc_id=plan.doc_id,
+                chunks=all_texts[offset:offset + n],
+                embeddings=all_embeddings[offset:offset + n],
+                meta=plan.meta,
+                content_hashes=plan.new_hashes,
+            )
+            offset += n
+            if on_written is not None:
+                await on_written(n)
+        await upsert_document(session, plan.doc_id, plan.doc_hash, len(plan.seen))
+    return len(all_texts)
 
 
 def _format_context(rows) -> str:
@@ -71,9 +252,23 @@ async def answer_question(
     question: str,
     k: int = 5,
     doc_id: str | None = None,
+    ef_search: int | None = None,
+    hybrid: bool = False,
 ) -> Tuple[str, List[Dict[str, Any]]]:
     q_emb = await embed_query(question)
-    rows = await search_similar(session=session, query_embedding=q_emb, k=k, doc_id=doc_id)
+    if hybrid:
+        rows = await search_hybrid(
+            session=session,
+            query_embedding=q_emb,
+            query_text=question,
+            k=k,
+            doc_id=doc_id,
+            ef_search=ef_search,
+        )
+    else:
+        rows = await search_similar(
+            session=session, query_embedding=q_emb, k=k, doc_id=doc_id, ef_search=ef_search
+        )
     context = _format_context(rows)
 
     system = (
@@ -1,6 +1,110 @@
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from models.rag import RagChunk
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy import Float, Text, cast, delete, func, insert, literal, literal_column, select, text
+from sqlalchemy.dialects.postgresql import TSQUERY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models.rag import TS_CONFIG, RagChunk, RagDocument
+
+RAG_VECTOR_INDEX_NAME = "ix_rag_chunks_embedding_hnsw"
+
+
+def _insert_batch_size() -> int:
+    return int(os.getenv("RAG_INSERT_BATCH_SIZE", "500"))
+
+
+def get_hnsw_params() -> tuple[int, int]:
+    m = int(os.getenv("RAG_HNSW_M", "16"))
+    ef_construction = int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", "64"))
+    return m, ef_construction
+
+
+async def ensure_vector_index(
+    conn: AsyncConnection,
+    m: int | None = None,
+    ef_construction: int | None = None,
+) -> bool:
+    """Create the HNSW cosine index on rag_chunks.embedding, or rebuild it if its
+    m/ef_construction differ from the requested values.
+
+    The rebuild locks rag_chunks against writes for its duration; it is run
+    explicitly via ``database_data/rag_index.py create``, never at startup.
+
+    Returns True when the index was (re)built.
+    """
+    default_m, default_ef_construction = get_hnsw_params()
+    m = int(m or default_m)
+    ef_construction = int(ef_construction or default_ef_construction)
+    wanted = {f"m={m}", f"ef_construction={ef_construction}"}
+
+    result = await conn.execute(
+        text("SELECT reloptions FROM pg_class WHERE relname = :name AND relkind = 'i'"),
+        {"name": RAG_VECTOR_INDEX_NAME},
+    )
+    row = result.first()
+    if row is not None and set(row[0] or []) == wanted:
+        return False
+    if row is not None:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {RAG_VECTOR_INDEX_NAME}"))
+
+    # m and ef_construction are ints, so inlining them is safe; DDL takes no binds.
+    await conn.execute(
+        text(
+            f"CREATE INDEX {RAG_VECTOR_INDEX_NAME} ON rag_chunks "
+            f"USING hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {m}, ef_construction = {ef_construction})"
+        )
+    )
+    return True
+
+
+# Arbitrary constant for pg_try_advisory_lock so only one worker builds the index.
+_VECTOR_INDEX_LOCK_KEY = 7316002
+
+
+async def create_vector_index_if_missing(conn: AsyncConnection) -> bool:
+    """Create the HNSW index with CREATE INDEX CONCURRENTLY if it does not exist.
+
+    Meant for app startup: an existing index is never rebuilt (use
+    ``database_data/rag_index.py create`` for that), and inserts keep working
+    while a missing index is built. ``conn`` must be in AUTOCOMMIT mode, since
+    CONCURRENTLY cannot run inside a transaction. When another process already
+    holds the build lock this returns False without waiting.
+    """
+    locked = await conn.scalar(
+        text("SELECT pg_try_advisory_lock(:key)"), {"key": _VECTOR_INDEX_LOCK_KEY}
+    )
+    if not locked:
+        return False
+    try:
+        valid = await conn.scalar(
+            text(
+                "SELECT i.indisvalid FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name"
+            ),
+            {"name": RAG_VECTOR_INDEX_NAME},
+        )
+        if valid:
+            return False
+        if valid is not None:
+            # Left behind INVALID by an interrupted concurrent build.
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {RAG_VECTOR_INDEX_NAME}"))
+        m, ef_construction = get_hnsw_params()
+        await conn.execute(
+            text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {RAG_VECTOR_INDEX_NAME} ON rag_chunks "
+                f"USING hnsw (embedding vector_cosine_ops) "
+                f"WITH (m = {m}, ef_construction = {ef_construction})"
+            )
+        )
+        return True
+    finally:
+        await conn.execute(
+            text("SELECT pg_advisory_unlock(:key)"), {"key": _VECTOR_INDEX_LOCK_KEY}
+        )
 
 
 async def insert_chunks(
@@ -9,37 +113,300 @@ async def insert_chunks(
     chunks: list[str],
     embeddings: list[list[float]],
     meta: dict | None = None,
+    batch_size: int | None = None,
+    content_hashes: list[str] | None = None,
 ) -> None:
+    """Bulk-insert chunks with Core executemany, committing every ``batch_size`` rows.
+
+    Batches committed before a failure stay in the table.
+    """
     if len(chunks) != len(embeddings):
         raise ValueError("chunks and embeddings must have same length")
+    if content_hashes is not None and len(content_hashes) != len(chunks):
+        raise ValueError("chunks and content_hashes must have same length")
+
+    batch_size = batch_size or _insert_batch_size()
+    if batch_size <= 0:
+        raise ValueError("batch_size must be > 0")
 
     rows = [
-        RagChunk(
-            doc_id=doc_id,
-            chunk_text=chunk,
-            embedding=embedding,
-            meta=meta or {},
+        {
+            "doc_id": doc_id,
+            "chunk_text": chunk,
+            "embedding": embedding,
+            "content_hash": content_hash,
+            "meta": meta or {},
+        }
+        for chunk, embedding, content_hash in zip(
+            chunks, embeddings, content_hashes or [None] * len(chunks)
         )
-        for chunk, embedding in zip(chunks, embeddings)
     ]
 
-    session.add_all(rows)
+    for start in range(0, len(rows), batch_size):
+        try:
+            await session.execute(insert(RagChunk), rows[start:start + batch_size])
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
+async def get_chunk_hashes(
+    session: AsyncSession,
+    doc_ids: list[str],
+) -> dict[str, list[tuple[int, str | None]]]:
+    """(id, content_hash) of every stored chunk, grouped by doc_id."""
+    result: dict[str, list[tuple[int, str | None]]] = {doc_id: [] for doc_id in doc_ids}
+    if not doc_ids:
+        return result
+    res = await session.execute(
+        select(RagChunk.doc_id, RagChunk.id, RagChunk.content_hash).where(
+            RagChunk.doc_id.in_(doc_ids)
+        )
+    )
+    for doc_id, chunk_id, content_hash in res.all():
+        result[doc_id].append((chunk_id, content_hash))
+    return result
+
+
+async def delete_chunks(session: AsyncSession, chunk_ids: list[int]) -> None:
+    if not chunk_ids:
+        return
     try:
+        await session.execute(delete(RagChunk).where(RagChunk.id.in_(chunk_ids)))
         await session.commit()
     except Exception:
         await session.rollback()
         raise
 
 
+# Namespace (first key of the two-int advisory lock) for per-document ingest locks.
+_DOCUMENT_LOCK_CLASS = 7316001
+
+
+@asynccontextmanager
+async def document_locks(session: AsyncSession, doc_ids: list[str]) -> AsyncIterator[None]:
+    """Hold an exclusive advisory lock per doc_id for the duration of the block.
+
+    Ingesting commits several times, so transaction-scoped locks would be
+    released too early; these are session-level locks held on a dedicated
+    connection from the session's engine. Locks are taken in sorted order so
+    overlapping ingests cannot deadlock.
+    """
+    async with session.bind.connect() as conn:
+        try:
+            for doc_id in sorted(set(doc_ids)):
+                await conn.execute(
+                    text("SELECT pg_advisory_lock(:cls, hashtext(:doc_id))"),
+                    {"cls": _DOCUMENT_LOCK_CLASS, "doc_id": doc_id},
+                )
+            await conn.commit()
+            yield
+        finally:
+            # Session-level locks survive returning the connection to the pool.
+            await conn.execute(text("SELECT pg_advisory_unlock_all()"))
+            await conn.commit()
+
+
+async def get_documents(session: AsyncSession, doc_ids: list[str]) -> dict[str, RagDocument]:
+    if not doc_ids:
+        return {}
+    res = await session.execute(select(RagDocument).where(RagDocument.doc_id.in_(doc_ids)))
+    return {d.doc_id: d for d in res.scalars().all()}
+
+
+async def upsert_document(
+    session: AsyncSession,
+    doc_id: str,
+    content_hash: str,
+    chunk_count: int,
+) -> None:
+    """Record a new version of the document, bumping its version number."""
+    stmt = pg_insert(RagDocument).values(
+        doc_id=doc_id, version=1, content_hash=content_hash, chunk_count=chunk_count
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[RagDocument.doc_id],
+        set_={
+            "version": RagDocument.version + 1,
+            "content_hash": stmt.excluded.content_hash,
+            "chunk_count": stmt.excluded.chunk_count,
+            "updated_at": text("now()"),
+        },
+    )
+    try:
+        await session.execute(stmt)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+
+_pgvector_version: tuple[int, ...] | None = None
+
+# pgvector's default hnsw.ef_search.
+_DEFAULT_EF_SEARCH = 40
+
+
+def _filtered_ef_search() -> int:
+    return int(os.getenv("RAG_HNSW_FILTERED_EF_SEARCH", "400"))
+
+
+async def _get_pgvector_version(session: AsyncSession) -> tuple[int, ...]:
+    global _pgvector_version
+    if _pgvector_version is None:
+        version = await session.scalar(
+            text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        )
+        _pgvector_version = tuple(int(p) for p in (version or "0").split(".") if p.isdigit())
+    return _pgvector_version
+
+
+async def _apply_search_knobs(
+    session: AsyncSession,
+    ef_search: int | None,
+    probes: int | None,
+    limit: int,
+    filtered: bool,
+) -> None:
+    """Per-query index settings.
+
+    HNSW returns at most ef_search candidates and applies WHERE filters after
+    the graph scan, so a doc_id filter can leave fewer than ``limit`` rows. For
+    filtered queries pgvector >= 0.8 keeps scanning until enough rows pass
+    (hnsw.iterative_scan); older versions get a larger ef_search instead.
+    """
+    ef_search = ef_search or int(os.getenv("RAG_HNSW_EF_SEARCH", "0")) or None
+    if filtered:
+        if await _get_pgvector_version(session) >= (0, 8):
+            await session.execute(
+                text("SELECT set_config('hnsw.iterative_scan', 'strict_order', true)")
+            )
+        else:
+            ef_search = max(ef_search or _DEFAULT_EF_SEARCH, _filtered_ef_search())
+    if limit > (ef_search or _DEFAULT_EF_SEARCH):
+        ef_search = limit
+    # set_config(..., true) is scoped to the current transaction, like SET LOCAL.
+    if ef_search is not None:
+        await session.execute(
+            text("SELECT set_config('hnsw.ef_search', :v, true)"), {"v": str(int(ef_search))}
+        )
+    if probes is not None:
+        await session.execute(
+            text("SELECT set_config('ivfflat.probes', :v, true)"), {"v": str(int(probes))}
+        )
+
+
 async def search_similar(
     session: AsyncSession,
     query_embedding: list[float],
     k: int = 5,
     doc_id: str | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
 ):
+    """Nearest chunks by cosine distance.
+
+    ``ef_search`` (HNSW) and ``probes`` (IVFFlat) trade latency for recall for
+    this query only. Queries filtered by doc_id still return k rows when the
+    document has them (see _apply_search_knobs).
+    """
+    await _apply_search_knobs(session, ef_search, probes, limit=k, filtered=doc_id is not None)
+
     stmt = select(RagChunk)
     if doc_id is not None:
         stmt = stmt.where(RagChunk.doc_id == doc_id)
     stmt = stmt.order_by(RagChunk.embedding.cosine_distance(query_embedding)).limit(k)
     res = await session.execute(stmt)
     return list(res.scalars().all())
+
+
+def lexical_tsquery(query_text: str):
+    """Full-text query matching chunks that contain *any* of the query's lexemes.
+
+    websearch_to_tsquery/plainto_tsquery AND every term together, so a long
+    query (e.g. a whole transcript) would match almost nothing. The terms are
+    normalised by plainto_tsquery and then OR-ed; the text -> tsquery cast
+    keeps the lexemes as-is instead of stemming them a second time. ts_rank_cd
+    still ranks chunks covering more of the terms higher.
+    """
+    cfg = literal_column(f"'{TS_CONFIG}'::regconfig")
+    anded = cast(func.plainto_tsquery(cfg, query_text), Text)
+    return cast(func.replace(anded, " & ", " | "), TSQUERY)
+
+
+async def count_lexical_matches(
+    session: AsyncSession, query_text: str, doc_id: str | None = None
+) -> int:
+    """Number of chunks the lexical side of search_hybrid can draw from."""
+    stmt = select(func.count(RagChunk.id)).where(
+        RagChunk.chunk_tsv.op("@@")(lexical_tsquery(query_text))
+    )
+    if doc_id is not None:
+        stmt = stmt.where(RagChunk.doc_id == doc_id)
+    return int(await session.scalar(stmt) or 0)
+
+
+async def search_hybrid(
+    session: AsyncSession,
+    query_embedding: list[float],
+    query_text: str,
+    k: int = 5,
+    doc_id: str | None = None,
+    candidates: int | None = None,
+    rrf_k: int = 60,
+    ef_search: int | None = None,
+    probes: int | None = None,
+):
+    """Lexical + vector search fused with reciprocal rank fusion, in one query.
+
+    The top ``candidates`` chunks by cosine distance and by full-text rank
+    (ts_rank_cd over chunk_tsv for any of the query's terms, length-normalised)
+    are each ranked 1..n, and every chunk scores sum(1 / (rrf_k + rank)) across
+    the lists it appears in. Exact Norwegian terms thus surface even when their
+    embedding similarity is mediocre.
+    """
+    candidates = candidates or max(4 * k, 20)
+    await _apply_search_knobs(
+        session, ef_search, probes, limit=candidates, filtered=doc_id is not None
+    )
+
+    filters = [RagChunk.doc_id == doc_id] if doc_id is not None else []
+
+    distance = RagChunk.embedding.cosine_distance(query_embedding)
+    vec = (
+        select(RagChunk.id, func.row_number().over(order_by=distance).label("rank"))
+        .where(*filters)
+        .order_by(distance)
+        .limit(candidates)
+        .cte("vec")
+    )
+
+    tsquery = lexical_tsquery(query_text)
+    lex_score = func.ts_rank_cd(RagChunk.chunk_tsv, tsquery, 1)
+    lex = (
+        select(RagChunk.id, func.row_number().over(order_by=lex_score.desc()).label("rank"))
+        .where(RagChunk.chunk_tsv.op("@@")(tsquery), *filters)
+        .order_by(lex_score.desc())
+        .limit(candidates)
+        .cte("lex")
+    )
+
+    one = literal(1.0, Float)
+    score = (
+        func.coalesce(one / (rrf_k + vec.c.rank), 0.0)
+        + func.coalesce(one / (rrf_k + lex.c.rank), 0.0)
+    )
+    fused = (
+        select(func.coalesce(vec.c.id, lex.c.id).label("id"), score.label("score"))
+        .select_from(vec.join(lex, vec.c.id == lex.c.id, full=True))
+        .subquery("fused")
+    )
+    stmt = (
+        select(RagChunk)
+        .join(fused, RagChunk.id == fused.c.id)
+        .order_by(fused.c.score.desc(), RagChunk.id)
+        .limit(k)
+    )
+    res = await session.execute(stmt)
+    return list(res.scalars().all())
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.scenario import Scenario
+
+
+@dataclass(frozen=True)
+class CachedScenario:
+    """Detached snapshot of a Scenario row plus its prebuilt chat system messages."""
+
+    id: int
+    title: str
+    description: Optional[str]
+    difficulty: Optional[str]
+    category: Optional[str]
+    system_prompt: str
+    system_messages: List[dict] = field(default_factory=list)
+
+
+# scenario_id -> (expires_at, snapshot). None snapshots cache "not found" as well.
+_cache: Dict[int, Tuple[float, Optional[CachedScenario]]] = {}
+_cache_lock = threading.Lock()
+
+
+def _ttl_seconds() -> float:
+    return float(os.getenv("SCENARIO_CACHE_TTL_SECONDS", "300"))
+
+
+def _build_system_messages(scenario: Scenario) -> List[dict]:
+    if not scenario.system_prompt:
+        return []
+    return [
+        {"role": "system", "content": scenario.system_prompt},
+        {
+            "role": "system",
+            "content": (
+                f"Scenario: {scenario.title}\n"
+                f"Beskrivelse: {scenario.description or ''}\n"
+                f"Vanskelighetsgrad: {scenario.difficulty or ''}\n"
+                f"Kategori: {scenario.category or ''}\n"
+            ).strip(),
+        },
+    ]
+
+
+def _snapshot(scenario: Scenario) -> CachedScenario:
+    return CachedScenario(
+        id=scenario.id,
+        title=scenario.title,
+        description=scenario.description,
+        difficulty=scenario.difficulty,
+        category=scenario.category,
+        system_prompt=scenario.system_prompt,
+        system_messages=_build_system_messages(scenario),
+    )
+
+
+async def get_scenario(db: AsyncSession, scenario_id: int) -> CachedScenario | None:
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(scenario_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+    result = await db.execute(select(Scenario).where(Scenario.id == scenario_id))
+    scenario = result.scalar_one_or_none()
+    snapshot = _snapshot(scenario) if scenario else None
+
+    with _cache_lock:
+        _cache[scenario_id] = (time.monotonic() + _ttl_seconds(), snapshot)
+    return snapshot
+
+
+def invalidate(scenario_id: int | None = None) -> None:
+    """Drop one cached scenario, or all of them when no id is given.
+
+    Invalidation is per process; other workers pick up changes when their TTL expires.
+    """
+    with _cache_lock:
+        if scenario_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(scenario_id, None)
@@ -0,0 +1,75 @@
+import asyncio
+import os
+from typing import BinaryIO
+
+import httpx
+
+
+_http_client: httpx.AsyncClient | None = None
+_request_semaphore: asyncio.Semaphore | None = None
+
+
+def get_base_url() -> str:
+    return os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io")
+
+
+def get_stt_model() -> str:
+    return os.getenv("ELEVENLABS_STT_MODEL", "scribe_v2")
+
+
+def _max_concurrency() -> int:
+    return int(os.getenv("STT_MAX_CONCURRENCY", "8"))
+
+
+def _client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is not None:
+        return _http_client
+    api_key = os.getenv("ELEVENLABS_API_KEY")
+    if not api_key:
+        raise RuntimeError("ELEVENLABS_API_KEY is not set")
+    max_connections = _max_concurrency()
+    _http_client = httpx.AsyncClient(
+        base_url=get_base_url(),
+        headers={"xi-api-key": api_key},
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+        timeout=httpx.Timeout(float(os.getenv("STT_TIMEOUT_SECONDS", "60")), connect=10.0),
+    )
+    return _http_client
+
+
+def _limiter() -> asyncio.Semaphore:
+    global _request_semaphore
+    if _request_semaphore is None:
+        _request_semaphore = asyncio.Semaphore(_max_concurrency())
+    return _request_semaphore
+
+
+async def transcribe(audio: BinaryIO, filename: str | None, content_type: str | None) -> str:
+    """Send audio to the speech-to-text API and return the transcript.
+
+    ``audio`` is streamed into the multipart body in chunks rather than read
+    into memory first. Raises httpx.HTTPError on transport or HTTP errors.
+    """
+    client = _client()
+    audio.seek(0)
+    async with _limiter():
+        response = await client.post(
+            "/v1/speech-to-text",
+            files={"file": (filename or "audio", audio, content_type or "application/octet-stream")},
+            data={"model_id": get_stt_model()},
+        )
+    response.raise_for_status()
+    return response.json()["text"]
+
+
+async def close_client() -> None:
+    global _http_client, _request_semaphore
+    client = _http_client
+    _http_client = None
+    _request_semaphore = None
+    if client is not None:
+        await client.aclose()
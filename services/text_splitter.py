@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import re
+from typing import Iterator, List, Tuple
+
+from services.openai_client import get_embedding_model
+from services.tokenizer import get_encoding
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# Sentence end followed by whitespace; keeps abbreviations like "f.eks. noe" together
+# as long as the next word starts in lower case.
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?…:;])\s+(?=[\"«(\[A-ZÆØÅ0-9•\-–])")
+
+
+def _paragraphs(text: str) -> Iterator[str]:
+    start = 0
+    for m in _PARAGRAPH_BREAK.finditer(text):
+        para = text[start:m.start()].strip()
+        if para:
+            yield para
+        start = m.end()
+    tail = text[start:].strip()
+    if tail:
+        yield tail
+
+
+def _sentences(paragraph: str) -> Iterator[str]:
+    # PDF extraction leaves hard line breaks inside paragraphs.
+    flat = " ".join(paragraph.split())
+    for sentence in _SENTENCE_BREAK.split(flat):
+        if sentence:
+            yield sentence
+
+
+def _cut_long_sentence(
+    enc, tokens: List[int], max_tokens: int, overlap_tokens: int
+) -> Iterator[Tuple[str, int]]:
+    """Windows of ``max_tokens`` tokens, cut on character boundaries.
+
+    Decoding a token slice directly can split a multi-byte UTF-8 character and
+    leave U+FFFD in the text; character offsets avoid that.
+    """
+    text, offsets = enc.decode_with_offsets(tokens)
+    step = max_tokens - overlap_tokens
+    for i in range(0, len(tokens), step):
+        stop = min(i + max_tokens, len(tokens))
+        char_stop = offsets[stop] if stop < len(tokens) else len(text)
+        piece = text[offsets[i]:char_stop]
+        if piece:
+            yield piece, stop - i
+        if stop == len(tokens):
+            break
+
+
+def iter_chunks_with_tokens(
+    text: str,
+    max_tokens: int = 300,
+    overlap_tokens: int = 50,
+    model: str | None = None,
+) -> Iterator[Tuple[str, int]]:
+    """Yield (chunk, token_count) pairs, lazily, in document order.
+
+    Chunks are packed from whole sentences. A paragraph joins the current chunk
+    only if all of it fits; otherwise the chunk ends at the paragraph break.
+    Paragraphs longer than ``max_tokens`` span several chunks, and consecutive
+    chunks within one share up to ``overlap_tokens`` of trailing sentences.
+    Sentences longer than ``max_tokens`` are cut between tokens, at the nearest
+    character boundary. Token counts are the sum of the parts and can be off by
+    a token or two at the joins.
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be > 0")
+    if overlap_tokens < 0:
+        raise ValueError("overlap_tokens must be >= 0")
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be < max_tokens")
+
+    enc = get_encoding(model or get_embedding_model())
+
+    # (separator_before, text, tokens) for the chunk being built
+    parts: List[Tuple[str, str, int]] = []
+    used = 0
+    fresh = False  # parts holds something beyond the carried-over overlap
+
+    def emit() -> Tuple[str, int]:
+        body = "".join(sep + t for sep, t, _ in parts).strip()
+        return body, used
+
+    def carry_overlap() -> None:
+        nonlocal parts, used
+        kept: List[Tuple[str, str, int]] = []
+        kept_tokens = 0
+        for part in reversed(parts):
+            if kept_tokens + part[2] > overlap_tokens:
+                break
+            kept.insert(0, part)
+            kept_tokens += part[2]
+        if kept:
+            kept[0] = ("", kept[0][1], kept[0][2])
+        parts = kept
+        used = kept_tokens
+
+    for paragraph in _paragraphs(text):
+        sentences = [(sentence, enc.encode(sentence)) for sentence in _sentences(paragraph)]
+        if fresh and used + sum(len(tokens) for _, tokens in sentences) > max_tokens:
+            # Paragraph does not fit: end the chunk at the paragraph break.
+            yield emit()
+            parts, used, fresh = [], 0, False
+        sep = "\n\n"
+        for sentence, tokens in sentences:
+            pieces = [(sentence, len(tokens))]
+            if len(tokens) > max_tokens:
+                pieces = list(_cut_long_sentence(enc, tokens, max_tokens, overlap_tokens))
+            for piece, n in pieces:
+                if fresh and used + n > max_tokens:
+                    yield emit()
+                    carry_overlap()
+                    fresh = False
+                    if used + n > max_tokens:
+                        parts, used = [], 0
+                parts.append((sep if parts else "", piece, n))
+                used += n
+                fresh = True
+                sep = " "
+
+    if fresh:
+        yield emit()
+
+
+def iter_chunks(
+    text: str,
+    max_tokens: int = 300,
+    overlap_tokens: int = 50,
+    model: str | None = None,
+) -> Iterator[str]:
+    for chunk, _tokens in iter_chunks_with_tokens(text, max_tokens, overlap_tokens, model):
+        yield chunk
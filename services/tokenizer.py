@@ -0,0 +1,22 @@
+from functools import lru_cache
+
+import tiktoken
+
+from services.openai_client import get_chat_model
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Newer model names are not always known to the installed tiktoken.
+        return tiktoken.get_encoding("o200k_base")
+
+
+def get_encoding(model: str | None = None) -> tiktoken.Encoding:
+    return _encoding(model or get_chat_model())
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    return len(get_encoding(model).encode(text))
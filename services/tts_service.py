@@ -1,24 +1,201 @@
+import asyncio
+import hashlib
+import json
+import logging
 import os
-from elevenlabs.client import ElevenLabs
+import threading
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO
+from uuid import uuid4
 
+import httpx
+from elevenlabs.client import AsyncElevenLabs
 
-def _client() -> ElevenLabs:
+logger = logging.getLogger(__name__)
+
+TTS_MODEL_ID = "eleven_turbo_v2_5"
+TTS_OUTPUT_FORMAT = "mp3_44100_128"
+TTS_LANGUAGE_CODE = "no"
+
+_WRITE_BATCH_BYTES = 64 * 1024
+
+_http_client: httpx.AsyncClient | None = None
+_tts_client: AsyncElevenLabs | None = None
+
+_cache_lock = threading.Lock()
+_cache_bytes: int | None = None  # lazily computed from the cache directory
+
+
+def _client() -> AsyncElevenLabs:
+    global _http_client, _tts_client
+    if _tts_client is not None:
+        return _tts_client
     api_key = os.getenv("ELEVENLABS_API_KEY")
     if not api_key:
         raise RuntimeError("ELEVENLABS_API_KEY is not set")
-    return ElevenLabs(api_key=api_key)
+    max_connections = int(os.getenv("TTS_MAX_CONNECTIONS", "8"))
+    _http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+        timeout=httpx.Timeout(float(os.getenv("TTS_TIMEOUT_SECONDS", "60")), connect=10.0),
+    )
+    _tts_client = AsyncElevenLabs(
+        api_key=api_key,
+        base_url=os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io"),
+        httpx_client=_http_client,
+    )
+    return _tts_client
 
 
 def get_voice_id() -> str:
     return os.getenv("ELEVENLABS_VOICE_ID", "uNsWM1StCcpydKYOjKyu")
 
 
-def text_to_speech_stream(text: str):
-    client = _client()
-    return client.text_to_speech.stream(
-        voice_id=get_voice_id(),
+def _cache_dir() -> Path:
+    return Path(os.getenv("TTS_CACHE_DIR", ".cache/tts"))
+
+
+def _cache_max_bytes() -> int:
+    # 0 disables the cache.
+    return int(os.getenv("TTS_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+
+
+def _cache_path(text: str, voice_id: str) -> Path:
+    key = hashlib.sha256(
+        json.dumps(
+            [voice_id, TTS_MODEL_ID, TTS_OUTPUT_FORMAT, TTS_LANGUAGE_CODE, text],
+            ensure_ascii=False,
+        ).encode("utf-8")
+    ).hexdigest()
+    return _cache_dir() / key[:2] / f"{key}.mp3"
+
+
+def _cached_files() -> list[Path]:
+    return [p for p in _cache_dir().glob("*/*.mp3") if p.is_file()]
+
+
+def _evict_if_needed(added: int) -> None:
+    """Track the cache size and delete least recently used files over the cap.
+
+    Recency is the file mtime, which cache hits bump.
+    """
+    global _cache_bytes
+    with _cache_lock:
+        if _cache_bytes is None:
+            _cache_bytes = sum(p.stat().st_size for p in _cached_files())
+        else:
+            _cache_bytes += added
+        max_bytes = _cache_max_bytes()
+        if _cache_bytes <= max_bytes:
+            return
+        files = sorted(_cached_files(), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            if _cache_bytes <= max_bytes:
+                break
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                _cache_bytes -= size
+            except FileNotFoundError:
+                continue
+
+
+def _touch_cached(path: Path) -> bool:
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+async def get_cached_audio(text: str) -> Path | None:
+    """Path of previously synthesized audio for this text, or None."""
+    if _cache_max_bytes() <= 0:
+        return None
+    path = _cache_path(text, get_voice_id())
+    if not await asyncio.to_thread(_touch_cached, path):
+        return None
+    return path
+
+
+def _open_temp(path: Path, tmp_path: Path) -> BinaryIO:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return open(tmp_path, "wb")
+
+
+def _finish_temp(f: BinaryIO, path: Path, tmp_path: Path, keep: bool) -> None:
+    f.close()
+    if keep:
+        os.replace(tmp_path, path)
+    else:
+        tmp_path.unlink(missing_ok=True)
+
+
+async def text_to_speech_stream(text: str) -> AsyncIterator[bytes]:
+    """Stream synthesized audio, saving a copy to the cache once it completes.
+
+    Partial audio (errors, client disconnects) never reaches the cache.
+    """
+    voice_id = get_voice_id()
+    stream = _client().text_to_speech.stream(
+        voice_id=voice_id,
         text=text,
-        model_id="eleven_turbo_v2_5",
-        output_format="mp3_44100_128",
-        language_code="no",
+        model_id=TTS_MODEL_ID,
+        output_format=TTS_OUTPUT_FORMAT,
+        language_code=TTS_LANGUAGE_CODE,
     )
+    if _cache_max_bytes() <= 0:
+        async for chunk in stream:
+            yield chunk
+        return
+
+    # All file I/O runs in worker threads; writes are batched to limit hops.
+    path = _cache_path(text, voice_id)
+    tmp_path = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+    f = await asyncio.to_thread(_open_temp, path, tmp_path)
+    pending = bytearray()
+    written = 0
+    completed = False
+    try:
+        async for chunk in stream:
+            pending += chunk
+            written += len(chunk)
+            if len(pending) >= _WRITE_BATCH_BYTES:
+                await asyncio.to_thread(f.write, bytes(pending))
+                pending.clear()
+            yield chunk
+        if pending:
+            await asyncio.to_thread(f.write, bytes(pending))
+        completed = True
+    finally:
+        await asyncio.to_thread(_finish_temp, f, path, tmp_path, completed and written > 0)
+    try:
+        await asyncio.to_thread(_evict_if_needed, written)
+    except OSError:
+        logger.warning("TTS cache eviction failed.", exc_info=True)
+
+
+async def close_client() -> None:
+    global _http_client, _tts_client
+    client = _http_client
+    _http_client = None
+    _tts_client = None
+    if client is not None:
+        await client.aclose()
+
+
+async def synthesize(text: str) -> AsyncIterator[bytes]:
+    """Audio for ``text``: the cached file when present, otherwise a fresh stream."""
+    cached = await get_cached_audio(text)
+    if cached is not None:
+        try:
+            data = await asyncio.to_thread(cached.read_bytes)
+        except FileNotFoundError:
+            data = b""  # evicted between lookup and read
+        if data:
+            yield data
+            return
+    async for chunk in text_to_speech_stream(text):
+        yield chunk
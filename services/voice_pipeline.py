@@ -0,0 +1,97 @@
+import asyncio
+import os
+import re
+from typing import AsyncIterator
+
+from services.tts_service import synthesize
+
+
+# Setningsslutt: tegnsetting (evt. etterfulgt av anførselstegn/parentes) og mellomrom, eller linjeskift.
+_SENTENCE_END = re.compile(r"[.!?…]+[\"»')\]]*\s+|\n+")
+
+_END = object()
+
+
+def _min_sentence_chars() -> int:
+    return int(os.getenv("VOICE_MIN_SENTENCE_CHARS", "20"))
+
+
+def _pipeline_depth() -> int:
+    return max(1, int(os.getenv("VOICE_TTS_LOOKAHEAD", "2")))
+
+
+def _find_cut(buffer: str, min_chars: int) -> int | None:
+    for match in _SENTENCE_END.finditer(buffer):
+        if match.start() + 1 >= min_chars:
+            return match.end()
+    return None
+
+
+async def split_sentences(
+    deltas: AsyncIterator[str], min_chars: int | None = None
+) -> AsyncIterator[str]:
+    """Regroup streamed completion deltas into sentences.
+
+    A sentence is only emitted once the whitespace after its final punctuation
+    has arrived, so "3." followed by "5" is never cut. Very short sentences are
+    merged with the next one (``min_chars``) to avoid choppy TTS requests.
+    """
+    if min_chars is None:
+        min_chars = _min_sentence_chars()
+    buffer = ""
+    async for delta in deltas:
+        buffer += delta
+        while (cut := _find_cut(buffer, min_chars)) is not None:
+            sentence, buffer = buffer[:cut].strip(), buffer[cut:]
+            if sentence:
+                yield sentence
+    tail = buffer.strip()
+    if tail:
+        yield tail
+
+
+async def speak_sentences(sentences: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    """Synthesize sentences in order while later ones are still being produced.
+
+    Each sentence gets its own TTS stream as soon as it is available, with at
+    most VOICE_TTS_LOOKAHEAD sentences synthesizing ahead of the one being
+    streamed back. Audio is yielded strictly in sentence order.
+    """
+    pending: asyncio.Queue = asyncio.Queue(maxsize=_pipeline_depth())
+    tasks: set[asyncio.Task] = set()
+
+    async def synth(sentence: str, out: asyncio.Queue) -> None:
+        try:
+            async for chunk in synthesize(sentence):
+                out.put_nowait(chunk)
+        except Exception as e:
+            out.put_nowait(e)
+        else:
+            out.put_nowait(_END)
+
+    async def produce() -> None:
+        try:
+            async for sentence in sentences:
+                out: asyncio.Queue = asyncio.Queue()
+                await pending.put(out)
+                task = asyncio.create_task(synth(sentence, out))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except Exception as e:
+            await pending.put(e)
+        else:
+            await pending.put(_END)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (out := await pending.get()) is not _END:
+            if isinstance(out, Exception):
+                raise out
+            while (chunk := await out.get()) is not _END:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+    finally:
+        producer.cancel()
+        for task in list(tasks):
+            task.cancel()